@@ -0,0 +1,123 @@
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import asyncpg
+from cachetools import LRUCache
+
+from models import db
+from write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+# Buffered answers are written in one batch every N answers or T seconds, whichever comes first
+ANSWER_FLUSH_ROWS = int(os.environ.get("ANSWER_FLUSH_ROWS", 500))
+ANSWER_FLUSH_INTERVAL = float(os.environ.get("ANSWER_FLUSH_INTERVAL", 0.25))
+# After this many failed batches in a row, rows are retried one by one and bad ones dropped
+ANSWER_MAX_ATTEMPTS = int(os.environ.get("ANSWER_MAX_ATTEMPTS", 3))
+# Answers held while the database is failing; new answers are refused beyond this
+ANSWER_MAX_BACKLOG = int(os.environ.get("ANSWER_MAX_BACKLOG", 50000))
+# Recently buffered (user, quiz, group) keys, so duplicates are caught across flush windows too
+ANSWER_DEDUPE_SIZE = int(os.environ.get("ANSWER_DEDUPE_SIZE", 200000))
+
+
+class AnswerBuffer(WriteBehindBuffer):
+    """
+    Write-behind buffer for poll answers.
+
+    Handlers add an answer and return immediately; batches go to db.ingest_answers, which
+    writes scores, memberships and one counter UPDATE per user in a single transaction.
+    A failed batch is kept and retried after a backoff. A batch rejected by the database
+    (constraint violation, or ANSWER_MAX_ATTEMPTS failures in a row) is retried one row at a
+    time so a single bad row, e.g. an answer to a deleted quiz, is dropped instead of
+    blocking every later batch.
+    """
+
+    label = "answers"
+
+    def __init__(self, flush_rows: int = ANSWER_FLUSH_ROWS, flush_interval: float = ANSWER_FLUSH_INTERVAL):
+        super().__init__(flush_rows, flush_interval)
+        # _pending is keyed like the user_quiz_scores unique constraint; the first answer wins
+        self._seen: LRUCache = LRUCache(maxsize=ANSWER_DEDUPE_SIZE)
+        self.batches = 0
+        self.answers_flushed = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self._batch_sizes: Deque[int] = deque(maxlen=100)
+        self._flush_latencies: Deque[float] = deque(maxlen=100)
+
+    def add(self, user_id: int, username: Optional[str], first_name: Optional[str], last_name: Optional[str],
+            group_id: int, quiz_id: int, selected_option: int, points: int, clone_bot_id: Optional[int] = None) -> bool:
+        """Buffer one answer; False if it is a duplicate or was dropped (callers then send no reply)"""
+        key = (user_id, quiz_id, group_id)
+        if key in self._pending or key in self._seen:
+            self.duplicates += 1
+            return False
+        if len(self._pending) >= ANSWER_MAX_BACKLOG:
+            self.dropped += 1
+            logger.warning(f"Answer backlog full ({len(self._pending)}), dropping answer of user {user_id} to quiz {quiz_id}")
+            return False
+        self._seen[key] = True
+        self._pending[key] = {
+            'user_id': user_id,
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'clone_bot_id': clone_bot_id,
+            'group_id': group_id,
+            'quiz_id': quiz_id,
+            'selected_option': selected_option,
+            'points': points
+        }
+        self._schedule()
+        return True
+
+    async def _write(self, batch: Dict[Tuple[int, int, int], Dict]):
+        started = time.monotonic()
+        inserted = await db.ingest_answers(list(batch.values()))
+        self.batches += 1
+        self.answers_flushed += inserted
+        self._batch_sizes.append(len(batch))
+        self._flush_latencies.append(time.monotonic() - started)
+
+    async def _recover(self, batch: Dict[Tuple[int, int, int], Dict], error: Exception) -> Dict[Tuple[int, int, int], Dict]:
+        if isinstance(error, asyncpg.IntegrityError) or self._failed_attempts >= ANSWER_MAX_ATTEMPTS:
+            return await self._ingest_rows(batch)
+        return batch
+
+    async def _ingest_rows(self, batch: Dict[Tuple[int, int, int], Dict]) -> Dict[Tuple[int, int, int], Dict]:
+        """Write rows one at a time, dropping those the database rejects; returns the rows left to retry"""
+        keys: List[Tuple[int, int, int]] = list(batch)
+        for i, key in enumerate(keys):
+            answer = batch[key]
+            try:
+                self.answers_flushed += await db.ingest_answers([answer])
+            except asyncpg.PostgresError as e:
+                # Rejected by the server: retrying will never succeed
+                self.dropped += 1
+                logger.error(f"Dropping answer of user {answer['user_id']} to quiz {answer['quiz_id']} "
+                             f"in {answer['group_id']}: {e}")
+            except Exception as e:
+                # Connection/pool trouble, not the row: keep it and everything after it
+                logger.error(f"Row-by-row answer flush interrupted: {e}")
+                return {k: batch[k] for k in keys[i:]}
+        return {}
+
+    def stats(self) -> Dict:
+        """Buffer metrics: backlog, batches, answers_flushed, avg_batch, avg/max flush_ms, duplicates, failures, dropped"""
+        return {
+            'backlog': len(self._pending),
+            'batches': self.batches,
+            'answers_flushed': self.answers_flushed,
+            'avg_batch': sum(self._batch_sizes) / len(self._batch_sizes) if self._batch_sizes else 0.0,
+            'avg_flush_ms': sum(self._flush_latencies) / len(self._flush_latencies) * 1000 if self._flush_latencies else 0.0,
+            'max_flush_ms': max(self._flush_latencies) * 1000 if self._flush_latencies else 0.0,
+            'duplicates': self.duplicates,
+            'failures': self.failures,
+            'dropped': self.dropped
+        }
+
+
+answer_buffer = AnswerBuffer()
@@ -0,0 +1,59 @@
+"""
+Memory benchmark for in-memory poll mappings: dict entries (old layout) vs PollMapping slots.
+
+Usage: python bench_memory.py [rows]   (default 1,000,000 ≈ 5,000 chats × 200 polls)
+"""
+import gc
+import sys
+import tracemalloc
+
+from poll_store import PollMapping
+
+
+def _measure(build) -> int:
+    """Bytes still allocated by build() once it returns"""
+    gc.collect()
+    tracemalloc.start()
+    data = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size
+
+
+def old_layout(rows: int):
+    mappings = {}
+    for i in range(rows):
+        poll_id = str(5000000000000000000 + i)
+        mappings[poll_id] = {
+            'poll_id': poll_id,
+            'quiz_id': 10000 + i // 5000,
+            'group_id': -1001000000000 - i % 5000,
+            'message_id': 100000 + i,
+            'clone_bot_id': None,
+            'correct_option': i % 4
+        }
+    return mappings
+
+
+def slot_layout(rows: int):
+    mappings = {}
+    for i in range(rows):
+        poll_id = str(5000000000000000000 + i)
+        mappings[poll_id] = PollMapping(poll_id, 10000 + i // 5000, -1001000000000 - i % 5000,
+                                        100000 + i, None, i % 4)
+    return mappings
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    old = _measure(lambda: old_layout(rows))
+    new = _measure(lambda: slot_layout(rows))
+    print(f"{rows:,} poll mappings")
+    print(f"  dict entries:  {old / 2**20:8.1f} MiB ({old / rows:.0f} B/row)")
+    print(f"  slot records:  {new / 2**20:8.1f} MiB ({new / rows:.0f} B/row)")
+    print(f"  saved:         {(old - new) / 2**20:8.1f} MiB ({old / new:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
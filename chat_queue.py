@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from aiolimiter import AsyncLimiter
+from cachetools import LRUCache
+from telegram.error import RetryAfter
+
+from rate_limiter import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows a bot about 20 messages per minute into one group
+CHAT_SEND_PER_MINUTE = float(os.environ.get("CHAT_SEND_PER_MINUTE", 20))
+# Messages waiting per chat; when full the oldest is dropped (a stale reply is worth less than a fresh one)
+CHAT_QUEUE_MAX_DEPTH = int(os.environ.get("CHAT_QUEUE_MAX_DEPTH", 30))
+# Limiters of recently drained chats are kept so a chat that goes idle and comes back keeps its pacing
+CHAT_LIMITER_CACHE_SIZE = int(os.environ.get("CHAT_LIMITER_CACHE_SIZE", 5000))
+
+
+class _ChatQueue:
+    """Pending sends, pacing and counters for one (bot, chat)"""
+
+    def __init__(self, limiter: AsyncLimiter, max_depth: int):
+        self.items: Deque[Callable[[], Awaitable]] = deque()
+        self.max_depth = max_depth
+        self.limiter = limiter
+        self.worker: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+
+class ChatSendQueue:
+    """
+    Per-chat outbound queues for bursty traffic such as quiz answer replies.
+
+    Every (bot, chat) gets its own FIFO paced at CHAT_SEND_PER_MINUTE and drained by its own
+    worker, so a hot group is throttled without delaying sends to any other chat. Workers
+    exit and their queue is removed once it is empty; the limiter stays in a bounded LRU.
+    """
+
+    def __init__(self, per_minute: float = CHAT_SEND_PER_MINUTE, max_depth: int = CHAT_QUEUE_MAX_DEPTH):
+        self.per_minute = per_minute
+        self.max_depth = max_depth
+        self._queues: Dict[Tuple[int, int], _ChatQueue] = {}
+        self._limiters: LRUCache = LRUCache(maxsize=CHAT_LIMITER_CACHE_SIZE)
+        # Counters of queues already removed
+        self._retired = {'sent': 0, 'dropped': 0, 'failed': 0}
+
+    def submit(self, bot_id: int, chat_id: int, send: Callable[[], Awaitable]):
+        """Queue a send (a zero-argument coroutine function) for a chat"""
+        key = (bot_id, chat_id)
+        queue = self._queues.get(key)
+        if queue is None:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = AsyncLimiter(self.per_minute, 60)
+            queue = self._queues[key] = _ChatQueue(limiter, self.max_depth)
+        if len(queue.items) >= queue.max_depth:
+            queue.items.popleft()
+            queue.dropped += 1
+        queue.items.append(send)
+        if queue.worker is None or queue.worker.done():
+            queue.worker = asyncio.create_task(self._drain(key, queue))
+
+    async def _drain(self, key: Tuple[int, int], queue: _ChatQueue):
+        chat_id = key[1]
+        while queue.items:
+            async with queue.limiter:
+                if not queue.items:
+                    break
+                send = queue.items.popleft()
+                try:
+                    await send()
+                    queue.sent += 1
+                except RetryAfter as e:
+                    # The chat itself is flooded: wait it out and put the message back in front
+                    delay = retry_after_seconds(e)
+                    logger.warning(f"⚠️ Chat {chat_id} throttled for {delay:.0f}s, {len(queue.items)} queued")
+                    queue.items.appendleft(send)
+                    await asyncio.sleep(delay)
+                except Exception as e:
+                    queue.failed += 1
+                    logger.error(f"Queued send to chat {chat_id} failed: {e}")
+        # Empty: drop the queue (no await since the loop check, so no submit can slip in between)
+        if self._queues.get(key) is queue:
+            del self._queues[key]
+            self._retired['sent'] += queue.sent
+            self._retired['dropped'] += queue.dropped
+            self._retired['failed'] += queue.failed
+
+    def stats(self, top: int = 5) -> Dict:
+        """Totals plus the `top` busiest chats: {'chats', 'depth', 'sent', 'dropped', 'failed', 'hot': [...]}"""
+        queues = self._queues.items()
+        hot: List[Dict] = sorted(
+            ({'chat_id': chat_id, 'depth': len(q.items), 'sent': q.sent, 'dropped': q.dropped, 'failed': q.failed}
+             for (_, chat_id), q in queues),
+            key=lambda s: (s['depth'], s['dropped']),
+            reverse=True
+        )[:top]
+        return {
+            'chats': len(self._queues),
+            'depth': sum(len(q.items) for _, q in queues),
+            'sent': self._retired['sent'] + sum(q.sent for _, q in queues),
+            'dropped': self._retired['dropped'] + sum(q.dropped for _, q in queues),
+            'failed': self._retired['failed'] + sum(q.failed for _, q in queues),
+            'hot': [s for s in hot if s['depth'] or s['dropped']]
+        }
+
+
+chat_queue = ChatSendQueue()
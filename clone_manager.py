@@ -9,7 +9,12 @@ from telegram.ext import (
     PollAnswerHandler, ChatMemberHandler, CallbackQueryHandler,
     ContextTypes, filters
 )
+from answer_buffer import answer_buffer
+from chat_queue import chat_queue
 from models import db
+from poll_store import poll_store
+from rate_limiter import get_rate_limiter, CLONE_SEND_RATE
+from solutions import solution_sender
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +54,7 @@ class CloneBotInstance:
         app.add_handler(CommandHandler("cancel", self.cancel_command))
         app.add_handler(CommandHandler("language", self.language_command))
         app.add_handler(CommandHandler("leaderboard", self.leaderboard_command))
+        app.add_handler(CommandHandler("sol", self.sol_command))
         app.add_handler(PollAnswerHandler(self.handle_poll_answer))
         app.add_handler(ChatMemberHandler(
             self.handle_chat_member_update, ChatMemberHandler.MY_CHAT_MEMBER
@@ -174,19 +180,39 @@ class CloneBotInstance:
             text += f"{medal} {name}: **{score}** pts\n"
         await update.message.reply_text(text, parse_mode='Markdown')
 
+    async def sol_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        message = update.message
+        if not message.reply_to_message:
+            await message.reply_text("📚 Quiz ke reply me /sol bhejo, solution mil jayega.")
+            return
+        poll_data = await poll_store.find_by_message(update.effective_chat.id, message.reply_to_message.message_id)
+        if not poll_data:
+            await message.reply_text("⚠️ Is message ko quiz ke roop me nahi pehchana gaya.")
+            return
+        solution = await db.get_quiz_solution(poll_data.quiz_id)
+        if not solution:
+            await message.reply_text("❌ Is quiz ka solution abhi set nahi hua hai.")
+            return
+        try:
+            # Media is uploaded through this bot once, then sent by its own file_id
+            await solution_sender.send(context.bot, message, solution)
+        except Exception as e:
+            logger.error(f"Clone {self.clone_bot_id}: Error sending solution for quiz {poll_data.quiz_id}: {e}")
+            await message.reply_text("⚠️ Solution abhi bheja nahi ja saka, thodi der baad try karo.")
+
     async def handle_poll_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         poll_answer = update.poll_answer
         user = poll_answer.user
         poll_id = poll_answer.poll_id
         selected_options = poll_answer.option_ids
 
-        poll_data = await db.get_poll_mapping(poll_id)
+        poll_data = await poll_store.get(poll_id)
         if not poll_data:
             return
 
-        quiz_id = poll_data['quiz_id']
-        group_id = poll_data['group_id']
-        correct_option = poll_data['correct_option']
+        quiz_id = poll_data.quiz_id
+        group_id = poll_data.group_id
+        correct_option = poll_data.correct_option
 
         if len(selected_options) == 0:
             points = 0
@@ -195,23 +221,19 @@ class CloneBotInstance:
         else:
             points = -1
 
-        await db.add_user(
-            user_id=user.id,
-            username=user.username,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            clone_bot_id=self.clone_bot_id
-        )
-        await db.add_group_member(user.id, group_id)
-
         try:
-            await db.record_quiz_answer(
+            if not answer_buffer.add(
                 user_id=user.id,
+                username=user.username,
+                first_name=user.first_name,
+                last_name=user.last_name,
                 group_id=group_id,
                 quiz_id=quiz_id,
                 selected_option=selected_options[0] if selected_options else -1,
-                points=points
-            )
+                points=points,
+                clone_bot_id=self.clone_bot_id
+            ):
+                return
             if points == 4:
                 msg = random.choice(CORRECT_MSGS)
                 emoji = "🎉"
@@ -221,11 +243,12 @@ class CloneBotInstance:
             else:
                 return
             user_mention = f"[{user.first_name}](tg://user?id={user.id})"
-            await context.bot.send_message(
+            # Paced per group so a busy quiz doesn't flood the chat
+            chat_queue.submit(context.bot.id, group_id, lambda: context.bot.send_message(
                 chat_id=group_id,
                 text=f"{emoji} {user_mention} {msg}",
                 parse_mode='Markdown'
-            )
+            ))
         except Exception as e:
             logger.error(f"Clone {self.clone_bot_id}: Error recording answer: {e}")
 
@@ -245,7 +268,8 @@ class CloneBotInstance:
     async def track_groups(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         chat = update.effective_chat
         if chat and chat.type in ['group', 'supergroup', 'channel']:
-            await db.add_group(
+            # Only writes on first sight, title/type change or hourly heartbeat
+            await db.touch_group(
                 group_id=chat.id,
                 title=chat.title or '',
                 group_type=chat.type,
@@ -277,7 +301,6 @@ class CloneBotInstance:
             try:
                 await self._copy_message(context, target_id, message)
                 success += 1
-                await asyncio.sleep(0.05)
             except Exception:
                 failed += 1
 
@@ -344,7 +367,12 @@ class CloneBotInstance:
                 )
 
     async def run(self):
-        self.application = ApplicationBuilder().token(self.bot_token).build()
+        self.application = (
+            ApplicationBuilder()
+            .token(self.bot_token)
+            .rate_limiter(get_rate_limiter(self.bot_token, f"clone {self.clone_bot_id}", CLONE_SEND_RATE))
+            .build()
+        )
         self._register_handlers()
         await self.application.initialize()
         await self.application.start()
@@ -392,6 +420,11 @@ class CloneBotManager:
                 pass
         logger.info(f"Clone bot {clone_bot_id} fully stopped.")
 
+    async def stop_all_clones(self):
+        """Stop every running clone (waits for their in-flight handlers)"""
+        await asyncio.gather(*(self.stop_clone(clone_bot_id) for clone_bot_id in list(self.instances)),
+                             return_exceptions=True)
+
     async def start_all_clones(self):
         clones = await db.get_all_active_clone_bots()
         for clone in clones:
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Max polls in flight at once for each bot (the send rate itself is paced by rate_limiter.py)
+FANOUT_CONCURRENCY = int(os.environ.get("FANOUT_CONCURRENCY", 20))
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0 if empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+class FanoutStats:
+    """Per-run counters and send latencies for a fan-out"""
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.latencies: List[float] = []
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    @property
+    def rate(self) -> float:
+        """Successful sends per second"""
+        return self.sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def p50(self) -> float:
+        return _percentile(self.latencies, 50)
+
+    @property
+    def p95(self) -> float:
+        return _percentile(self.latencies, 95)
+
+    def summary(self) -> str:
+        """Short multi-line report for the admin group"""
+        return (
+            f"⚡ Throughput: {self.rate:.1f} polls/sec\n"
+            f"⏱️ Latency p50/p95: {self.p50 * 1000:.0f}/{self.p95 * 1000:.0f} ms\n"
+            f"⌛ Duration: {self.elapsed:.1f}s ({self.sent} sent, {self.failed} failed)"
+        )
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit for bulk sends.
+
+    The limit grows by one after each window of `limit` successful sends (additive increase)
+    and halves when Telegram throttles us (multiplicative decrease). A burst of 429s from
+    one overload only halves it once.
+    """
+
+    def __init__(self, initial: int = 25, minimum: int = 1, maximum: int = 50, cooldown: float = 1.0):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self.peak = initial
+        self.decreases = 0
+        self._in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the `limit` send slots"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.maximum:
+            self._successes = 0
+            self.limit += 1
+            self.peak = max(self.peak, self.limit)
+
+    def on_throttle(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._successes = 0
+        self.limit = max(self.minimum, self.limit // 2)
+        self.decreases += 1
+
+
+class FanoutEngine:
+    """
+    Sends one payload per target concurrently.
+
+    Targets are split into buckets (one per bot token); each bucket has its own concurrency
+    semaphore, so the main bot and every clone send in parallel without one bot's backlog
+    slowing down the others. Each bot's send rate is enforced by its Application's rate limiter.
+    """
+
+    def __init__(self, concurrency: int = FANOUT_CONCURRENCY):
+        self.concurrency = concurrency
+        # Persist across runs, so concurrent runs and back-to-back quizzes share one budget per bot
+        self._semaphores: Dict[Hashable, asyncio.Semaphore] = {}
+
+    def _semaphore(self, key: Hashable) -> asyncio.Semaphore:
+        if key not in self._semaphores:
+            self._semaphores[key] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[key]
+
+    async def run(self, targets: Iterable[Any],
+                  send_func: Callable[[Any], Awaitable[Any]],
+                  on_result: Optional[Callable[[Any, Any], Awaitable[None]]] = None,
+                  bucket: Optional[Callable[[Any], Hashable]] = None,
+                  on_failure: Optional[Callable[[Any, Exception], Awaitable[None]]] = None,
+                  stats: Optional[FanoutStats] = None) -> FanoutStats:
+        """
+        Send to every target and return the run's stats.
+
+        Args:
+            targets: Items passed one by one to send_func
+            send_func: Async function that sends to one target and returns the sent message
+            on_result: Optional async callback(target, result) awaited as each send succeeds
+            bucket: Optional function mapping a target to its rate-limit bucket (e.g. bot token)
+            on_failure: Optional async callback(target, error) awaited when a send fails
+            stats: Optional stats object to accumulate into (several runs, one report)
+        """
+        stats = stats or FanoutStats()
+
+        async def send_one(target):
+            async with self._semaphore(bucket(target) if bucket else None):
+                started = time.monotonic()
+                try:
+                    result = await send_func(target)
+                except Exception as e:
+                    stats.failed += 1
+                    logger.error(f"❌ Fan-out send failed for {target.get('chat_id') if isinstance(target, dict) else target}: {e}")
+                    if on_failure:
+                        try:
+                            await on_failure(target, e)
+                        except Exception as callback_error:
+                            logger.error(f"Fan-out failure callback failed: {callback_error}")
+                    return
+                stats.latencies.append(time.monotonic() - started)
+                stats.sent += 1
+                if on_result:
+                    try:
+                        await on_result(target, result)
+                    except Exception as e:
+                        logger.error(f"Fan-out result callback failed: {e}")
+
+        await asyncio.gather(*(send_one(target) for target in targets), return_exceptions=True)
+        stats.finished_at = time.monotonic()
+        return stats
+
+
+fanout_engine = FanoutEngine()
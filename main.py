@@ -4,6 +4,7 @@ import json
 import logging
 import os
 import random
+import signal
 from datetime import datetime, timezone, time
 from typing import Dict, List
 
@@ -33,6 +34,7 @@ from telegram import (
     ChatMember,
     Message
 )
+from telegram.error import RetryAfter
 from telegram.helpers import escape_markdown
 from telegram.ext import (
     Application, 
@@ -53,9 +55,21 @@ except ImportError:
 
 from models import db
 from clone_manager import clone_manager
+from fanout import fanout_engine, AdaptiveConcurrency, FanoutStats
+from poll_store import poll_store
+from quiz_registry import quiz_registry
+from answer_buffer import answer_buffer
+from chat_queue import chat_queue
+from reply_digest import reply_digest, REPLY_DIGEST_WINDOW
+from solutions import solution_sender
+from snapshot import (
+    SNAPSHOT_PATH, SNAPSHOT_INTERVAL, read_snapshot, write_snapshot,
+    pack_polls, unpack_polls, pack_json, unpack_json
+)
+from rate_limiter import get_rate_limiter, rate_limiters, retry_after_seconds
+from translation import quiz_translator
 from flask import Flask
 import threading
-from deep_translator import GoogleTranslator
 from urllib.parse import quote
 
 
@@ -67,6 +81,21 @@ ADMIN_GROUP_ID = -1003009412065
 TIMEZONE = pytz.timezone('Asia/Kolkata')
 OWNER_ID = 8147394357
 
+# Quiz delivery outbox
+QUIZ_FORWARD_DELAY = 30  # seconds between setting the answer and forwarding
+OUTBOX_WORKERS = int(os.environ.get("OUTBOX_WORKERS", 2))  # concurrent claim/send loops per quiz
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 200))  # rows claimed per round trip
+OUTBOX_RETENTION_DAYS = int(os.environ.get("OUTBOX_RETENTION_DAYS", 7))  # delivery history kept for analysis
+OUTBOX_RESUME_MAX_AGE_HOURS = float(os.environ.get("OUTBOX_RESUME_MAX_AGE_HOURS", 6))  # older unsent rows are cancelled on restart
+
+# Broadcasts: starting / maximum concurrent sends (adapted live), and attempts per chat when throttled
+BROADCAST_CONCURRENCY = int(os.environ.get("BROADCAST_CONCURRENCY", 25))
+BROADCAST_MAX_CONCURRENCY = int(os.environ.get("BROADCAST_MAX_CONCURRENCY", 50))
+RETRY_AFTER_ATTEMPTS = int(os.environ.get("RETRY_AFTER_ATTEMPTS", 5))
+
+# Reply digests: users mentioned per section before the rest are summarized as a count
+REPLY_DIGEST_MAX_MENTIONS = int(os.environ.get("REPLY_DIGEST_MAX_MENTIONS", 40))
+
 # Configure logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -263,15 +292,20 @@ WRONG_MESSAGES = [
     "😮‍💨 Wrong answer, waise wo tum hi ho na jo Har group me 'i need study partner' message karta hai😂! -1 point" 
 ]
 
+# Hardcoded replies as send-ready entries; custom replies from the DB are prepended at load time
+_DEFAULT_REPLY_POOLS = {
+    "positive": tuple({'message_type': 'text', 'content': msg} for msg in CORRECT_MESSAGES),
+    "negative": tuple({'message_type': 'text', 'content': msg} for msg in WRONG_MESSAGES),
+}
+_DEFAULT_TEXT_POOLS = {"positive": tuple(CORRECT_MESSAGES), "negative": tuple(WRONG_MESSAGES)}
+
 class NEETQuizBot:
     def __init__(self):
         self.application = None
-        self.quiz_data = {}  # Store active quizzes
-        self.poll_mapping = {}  # Store poll_id -> {quiz_id, group_id, message_id}
-        self.quiz_mapping = {}  # {forwarded_message_id: quiz_id}
+        # Reply pools per reply type, rebuilt by load_reply_pools() whenever custom replies change
+        self.reply_pools = dict(_DEFAULT_REPLY_POOLS)  # {reply_type: (entry, ...)} for individual replies
+        self.text_reply_pools = dict(_DEFAULT_TEXT_POOLS)  # {reply_type: (text, ...)} for digests
         self.groups_cache = {}  # In-memory cache: {group_id: {"title": str, "type": str}} - works without DB
-        self.translation_cache = {}  # Cache translations: {(quiz_id, language): {'question': str, 'options': list}}
-        self.broadcast_semaphore = asyncio.Semaphore(25)  # Limit concurrent sends to 25
         # clone_setup_pending is now stored in DB (clone_pending table) — survives restarts
     
     async def _parallel_send(self, send_func, chat_ids: List, status_msg=None, context=None, label="Sending", 
@@ -299,111 +333,95 @@ class NEETQuizBot:
         total = len(chat_ids)
         processed = 0
         last_update = 0
+        concurrency = AdaptiveConcurrency(initial=BROADCAST_CONCURRENCY, maximum=BROADCAST_MAX_CONCURRENCY)
+        started = asyncio.get_running_loop().time()
+        
+        async def record_success(result, chat_id, chat_type):
+            nonlocal success_count
+            success_count += 1
+            if chat_type == 'channel':
+                results['channels'] += 1
+            elif chat_type in ['group', 'supergroup']:
+                results['groups'] += 1
+            else:
+                results['users'] += 1
+            
+            # Track sent message for /delete command
+            if track_messages and original_message_id and original_chat_id:
+                try:
+                    sent_msg_id = result.message_id if hasattr(result, 'message_id') else result
+                    if isinstance(sent_msg_id, int):
+                        await db.store_sent_message(
+                            original_message_id, original_chat_id,
+                            sent_msg_id, chat_id, sent_by
+                        )
+                except Exception as track_err:
+                    logger.debug(f"Failed to track message: {track_err}")
         
         async def send_with_semaphore(chat_info):
-            nonlocal success_count, failed_count, processed, last_update, results
+            nonlocal failed_count, processed, last_update
             
-            async with self.broadcast_semaphore:
-                chat_id = chat_info['id'] if isinstance(chat_info, dict) else chat_info
-                chat_type = chat_info.get('type', 'user') if isinstance(chat_info, dict) else 'user'
-                
-                try:
-                    # Attempt to send
-                    result = await send_func(chat_id)
-                    success = result is not None and result is not False
-                    if success:
-                        success_count += 1
-                        if chat_type == 'channel':
-                            results['channels'] += 1
-                        elif chat_type in ['group', 'supergroup']:
-                            results['groups'] += 1
-                        else:
-                            results['users'] += 1
-                        
-                        # Track sent message for /delete command
-                        if track_messages and original_message_id and original_chat_id:
-                            try:
-                                sent_msg_id = result.message_id if hasattr(result, 'message_id') else result
-                                if isinstance(sent_msg_id, int):
-                                    await db.store_sent_message(
-                                        original_message_id, original_chat_id,
-                                        sent_msg_id, chat_id, sent_by
-                                    )
-                            except Exception as track_err:
-                                logger.debug(f"Failed to track message: {track_err}")
-                    else:
+            chat_id = chat_info['id'] if isinstance(chat_info, dict) else chat_info
+            chat_type = chat_info.get('type', 'user') if isinstance(chat_info, dict) else 'user'
+            
+            for attempt in range(RETRY_AFTER_ATTEMPTS):
+                retry_after = None
+                async with concurrency.slot():
+                    try:
+                        result = await send_func(chat_id)
+                    except RetryAfter as e:
+                        # Throttled: back off the whole send and wait as long as Telegram asks
+                        concurrency.on_throttle()
+                        retry_after = retry_after_seconds(e)
+                    except Exception as e:
                         failed_count += 1
                         results['failed'] += 1
-                except Exception as e:
-                    error_msg = str(e).lower()
-                    # Handle rate limiting with exponential backoff
-                    if 'retry after' in error_msg or '429' in error_msg:
-                        try:
-                            # Extract retry time from error message
-                            retry_after = 1
-                            if 'retry after' in error_msg:
-                                parts = error_msg.split('retry after')
-                                if len(parts) > 1:
-                                    retry_after = int(''.join(filter(str.isdigit, parts[1][:10]))) or 1
-                            await asyncio.sleep(min(retry_after, 5))  # Max 5 seconds wait
-                            # Retry once
-                            try:
-                                result = await send_func(chat_id)
-                                success = result is not None and result is not False
-                                if success:
-                                    success_count += 1
-                                    if chat_type == 'channel':
-                                        results['channels'] += 1
-                                    elif chat_type in ['group', 'supergroup']:
-                                        results['groups'] += 1
-                                    else:
-                                        results['users'] += 1
-                                    
-                                    # Track sent message for /delete command
-                                    if track_messages and original_message_id and original_chat_id:
-                                        try:
-                                            sent_msg_id = result.message_id if hasattr(result, 'message_id') else result
-                                            if isinstance(sent_msg_id, int):
-                                                await db.store_sent_message(
-                                                    original_message_id, original_chat_id,
-                                                    sent_msg_id, chat_id, sent_by
-                                                )
-                                        except Exception as track_err:
-                                            logger.debug(f"Failed to track message: {track_err}")
-                                else:
-                                    failed_count += 1
-                                    results['failed'] += 1
-                            except:
-                                failed_count += 1
-                                results['failed'] += 1
-                        except:
+                        logger.debug(f"Send failed to {chat_id}: {e}")
+                    else:
+                        if result is not None and result is not False:
+                            concurrency.on_success()
+                            await record_success(result, chat_id, chat_type)
+                        else:
                             failed_count += 1
                             results['failed'] += 1
-                    else:
-                        failed_count += 1
-                        results['failed'] += 1
-                        logger.debug(f"Send failed to {chat_id}: {e}")
-                
-                processed += 1
-                
-                # Update status every 10% or 50 messages
-                if status_msg and context and (processed - last_update >= max(total // 10, 50)):
-                    last_update = processed
-                    progress_pct = int((processed / total) * 100)
-                    try:
-                        await status_msg.edit_text(
-                            f"📡 {label}...\n\n"
-                            f"⏳ Progress: {progress_pct}% ({processed}/{total})\n"
-                            f"✅ Sent: {success_count}\n"
-                            f"❌ Failed: {failed_count}"
-                        )
-                    except:
-                        pass  # Ignore edit errors
+                if retry_after is None:
+                    break
+                # Last attempt: give up now instead of waiting for a retry that will not happen
+                if attempt == RETRY_AFTER_ATTEMPTS - 1:
+                    continue
+                # Sleep outside the slot so the freed capacity is not held idle
+                await asyncio.sleep(retry_after)
+            else:
+                failed_count += 1
+                results['failed'] += 1
+                logger.warning(f"Giving up on {chat_id} after {RETRY_AFTER_ATTEMPTS} rate-limited attempts")
+            
+            processed += 1
+            
+            # Update status every 10% or 50 messages
+            if status_msg and context and (processed - last_update >= max(total // 10, 50)):
+                last_update = processed
+                progress_pct = int((processed / total) * 100)
+                try:
+                    await status_msg.edit_text(
+                        f"📡 {label}...\n\n"
+                        f"⏳ Progress: {progress_pct}% ({processed}/{total})\n"
+                        f"✅ Sent: {success_count}\n"
+                        f"❌ Failed: {failed_count}\n"
+                        f"⚙️ Concurrency: {concurrency.limit}"
+                    )
+                except:
+                    pass  # Ignore edit errors
         
         # Create all tasks and run them concurrently
         tasks = [send_with_semaphore(chat_info) for chat_info in chat_ids]
         await asyncio.gather(*tasks, return_exceptions=True)
         
+        elapsed = asyncio.get_running_loop().time() - started
+        results['concurrency'] = concurrency.limit
+        results['throughput'] = success_count / elapsed if elapsed > 0 else 0.0
+        logger.info(f"📡 {label}: {success_count} sent, {failed_count} failed at {results['throughput']:.1f} msg/sec "
+                    f"(concurrency settled at {concurrency.limit}, peak {concurrency.peak}, {concurrency.decreases} backoffs)")
         return success_count, failed_count, results
     
     async def check_force_join(self, user_id: int, context: ContextTypes.DEFAULT_TYPE) -> tuple[bool, List[Dict]]:
@@ -473,8 +491,33 @@ Hello! To use this bot, you need to join our official groups/channels first.
         """Initialize the bot and database"""
         await db.init_pool()
         
-        # Create bot application
-        self.application = Application.builder().token(BOT_TOKEN).build()
+        # Restore hot caches from the last snapshot before any update arrives
+        restored = self._load_snapshot()
+        
+        # Warm the phrase translation memo before any quiz arrives
+        if 'translations' not in restored:
+            await quiz_translator.load_phrases()
+        
+        # Build the quiz reply pools once; they are only rebuilt when custom replies change
+        await self.load_reply_pools()
+        
+        # Load every chat's settings so poll answers never query them
+        if 'group_settings' not in restored:
+            try:
+                warmed = await db.warm_group_settings()
+                logger.info(f"Cached settings for {warmed} groups/channels")
+            except Exception as e:
+                logger.warning(f"Could not warm group settings: {e}")
+        
+        # Create bot application; every request it makes shares one send-rate budget
+        self.application = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .rate_limiter(get_rate_limiter(BOT_TOKEN, "main"))
+            .build()
+        )
+        # Solution media is stored as this bot's file_ids; clones fetch files through it
+        solution_sender.source_bot = self.application.bot
         
         # Add default admin (you can add your user ID here)
         try:
@@ -513,6 +556,73 @@ Hello! To use this bot, you need to join our official groups/channels first.
             time=time(hour=22, minute=10, tzinfo=TIMEZONE),  # 10:10 PM IST
             name="daily_wrong_quiz_summary"
         )
+        
+        # Purge old delivery history daily at 3:30 AM IST
+        self.application.job_queue.run_daily(
+            callback=self.purge_delivery_outbox,
+            time=time(hour=3, minute=30, tzinfo=TIMEZONE),
+            name="purge_delivery_outbox"
+        )
+        
+        # Checkpoint hot caches so even an unclean restart comes back warm
+        self.application.job_queue.run_repeating(
+            callback=self.checkpoint_snapshot,
+            interval=SNAPSHOT_INTERVAL,
+            first=SNAPSHOT_INTERVAL,
+            name="snapshot_checkpoint"
+        )
+    
+    def _load_snapshot(self) -> set:
+        """Refill in-memory caches from the snapshot file; returns the names of restored sections"""
+        snapshot = read_snapshot(SNAPSHOT_PATH, {
+            'polls': unpack_polls,
+            'translations': unpack_json,
+            'groups_cache': unpack_json,
+            'group_settings': unpack_json
+        })
+        if snapshot is None:
+            logger.info("No usable snapshot, caches will warm from the database")
+            return set()
+        clean, created_at, sections = snapshot
+        if not clean:
+            # Settings may have changed after the last checkpoint; re-read them from the database
+            sections.pop('group_settings', None)
+        
+        restored = set()
+        for name, value in sections.items():
+            try:
+                if name == 'polls':
+                    poll_store.restore(value)
+                elif name == 'translations':
+                    quiz_translator.restore(value)
+                elif name == 'groups_cache':
+                    self.groups_cache.update({int(group_id): info for group_id, info in value.items()})
+                elif name == 'group_settings':
+                    db.restore_group_settings(value)
+                restored.add(name)
+            except Exception as e:
+                logger.warning(f"Could not restore {name} from snapshot: {e}")
+        age = datetime.now().timestamp() - created_at
+        logger.info(f"♻️ Restored {', '.join(sorted(restored))} from {'clean' if clean else 'checkpoint'} snapshot ({age:.0f}s old)")
+        return restored
+    
+    async def save_snapshot(self, clean: bool = False):
+        """Write hot in-memory state to the snapshot file (clean=True only on graceful shutdown)"""
+        try:
+            sections = {
+                'polls': pack_polls(poll_store.snapshot()),
+                'translations': pack_json(quiz_translator.snapshot()),
+                'groups_cache': pack_json(self.groups_cache),
+                'group_settings': pack_json(db.snapshot_group_settings())
+            }
+            await asyncio.to_thread(write_snapshot, SNAPSHOT_PATH, sections, clean)
+            logger.info(f"💾 Snapshot written ({sum(len(p) for p in sections.values()) / 1024:.0f} KiB)")
+        except Exception as e:
+            logger.error(f"Error writing snapshot: {e}")
+    
+    async def checkpoint_snapshot(self, context: ContextTypes.DEFAULT_TYPE):
+        """Periodic snapshot checkpoint"""
+        await self.save_snapshot()
 
     
     def _register_handlers(self):
@@ -546,6 +656,7 @@ Hello! To use this bot, you need to join our official groups/channels first.
         self.application.add_handler(CommandHandler("removereply", self.remove_reply_command))
         self.application.add_handler(CommandHandler("replyoff", self.replyoff_command))
         self.application.add_handler(CommandHandler("replyon", self.replyon_command))
+        self.application.add_handler(CommandHandler("replydigest", self.replydigest_command))
         self.application.add_handler(CommandHandler("language", self.language_command))
         self.application.add_handler(CommandHandler("emergencybroadcast", self.emergency_broadcast_command))
         self.application.add_handler(CommandHandler("ebroadcast", self.emergency_broadcast_command))
@@ -752,9 +863,9 @@ Let's ace NEET together! 🚀
                 "title": chat.title or "Unknown Group/Channel",
                 "type": chat.type
             }
-            # Try to add to database (may fail if DB is down)
+            # Persist on first sight, title/type change or hourly heartbeat (may fail if DB is down)
             try:
-                await db.add_group(chat.id, chat.title or "Unknown Group/Channel", chat.type)
+                await db.touch_group(chat.id, chat.title or "Unknown Group/Channel", chat.type)
             except Exception as e:
                 logger.warning(f"Failed to add group/channel to database: {e}")
     
@@ -804,17 +915,16 @@ Let's ace NEET together! 🚀
                     from_group_id=chat.id,
                     quiz_text=poll.question,
                     correct_option=-1,  # -1 indicates no correct answer set yet
-                    options=options
+                    options=options,
+                    explanation=poll.explanation
                 )
                 
-                # Store quiz data for tracking (without correct_option initially)
-                self.quiz_data[quiz_id] = {
-                    'correct_option': -1,  # Will be updated when admin replies
-                    'question': poll.question,
-                    'options': options,
-                    'message_id': message.message_id,  # Store for reply matching
-                    'poll_object': poll  # Store full poll for later forwarding
-                }
+                # Store quiz data for tracking (without correct_option initially); -1 is updated
+                # when admin replies, message_id is used for reply matching
+                quiz_registry.add(quiz_id, poll.question, options, -1, message.message_id, poll.explanation)
+                
+                # Translate in the background while the admin sets the answer
+                quiz_translator.start(quiz_id, poll.question, options, 'hindi')
                 
                 # Send instruction message to admin
                 instruction_text = f"""
@@ -826,7 +936,7 @@ Let's ace NEET together! 🚀
 • Type: `a`, `b`, `c`, `d` or `1`, `2`, `3`, `4`
 • Example: Just reply with `c`
 
-⏰ **Quiz will be forwarded to groups 30 seconds after you set the correct answer.**
+⏰ **Quiz will be forwarded to groups {QUIZ_FORWARD_DELAY} seconds after you set the correct answer.**
                 """
                 
                 await context.bot.send_message(
@@ -852,52 +962,105 @@ Let's ace NEET together! 🚀
                 from_group_id=chat.id,
                 quiz_text=poll.question,
                 correct_option=correct_option_id,
-                options=options
+                options=options,
+                explanation=poll.explanation
             )
         
             # Store quiz data for tracking
-            self.quiz_data[quiz_id] = {
-                'correct_option': correct_option_id,
-                'question': poll.question,
-                'options': options,
-                'message_id': message.message_id,
-                'poll_object': poll
-            }
+            quiz_registry.add(quiz_id, poll.question, options, correct_option_id, message.message_id, poll.explanation)
+            
+            # Translate in the background; the forwarding delay hides its latency
+            quiz_translator.start(quiz_id, poll.question, options, 'hindi')
             
-            # Schedule delayed forwarding (30 seconds)
+            # Schedule delayed forwarding
             await self._schedule_quiz_forwarding(quiz_id, context)
             
-            logger.info(f"⏰ Quiz {quiz_id} scheduled for forwarding in 30 seconds")
+            logger.info(f"⏰ Quiz {quiz_id} scheduled for forwarding in {QUIZ_FORWARD_DELAY} seconds")
             
         except Exception as e:
             logger.error(f"Error handling quiz: {e}")
     
     async def _schedule_quiz_forwarding(self, quiz_id: int, context: ContextTypes.DEFAULT_TYPE):
-        """Schedule quiz forwarding after 30 second delay"""
+        """Write the quiz's deliveries to the outbox and schedule forwarding after QUIZ_FORWARD_DELAY seconds"""
+        # Rows are durable, so a restart during the delay or mid fan-out resumes from the outbox
+        enqueued = True
+        try:
+            queued = await db.enqueue_quiz_deliveries(
+                quiz_id, self.application.bot.id, QUIZ_FORWARD_DELAY, exclude_chat_id=ADMIN_GROUP_ID
+            )
+        except Exception as e:
+            # Forward anyway: the job enqueues again when it runs
+            enqueued = False
+            logger.error(f"Could not queue deliveries of quiz {quiz_id}: {e}")
+            try:
+                await context.bot.send_message(
+                    chat_id=ADMIN_GROUP_ID,
+                    text=f"⚠️ Could not queue quiz {quiz_id} for delivery ({e}). Retrying when it is due."
+                )
+            except Exception as send_error:
+                logger.error(f"Error notifying admin group: {send_error}")
         self.application.job_queue.run_once(
             callback=self._forward_quiz_to_groups,
-            when=30,  # 30 seconds delay
+            when=QUIZ_FORWARD_DELAY,
             name=f"forward_quiz_{quiz_id}",
-            data={'quiz_id': quiz_id}
+            data={'quiz_id': quiz_id, 'enqueue': not enqueued}
         )
-        logger.info(f"⏰ Quiz {quiz_id} scheduled for forwarding in 30 seconds")
+        if enqueued:
+            logger.info(f"⏰ Quiz {quiz_id} queued for {queued} chats, forwarding in {QUIZ_FORWARD_DELAY} seconds")
+    
+    async def _resume_deliveries(self):
+        """Reschedule outbox rows left unsent by a previous run"""
+        try:
+            unfinished = await db.get_unfinished_deliveries(OUTBOX_RESUME_MAX_AGE_HOURS)
+        except Exception as e:
+            logger.error(f"Could not check the delivery outbox: {e}")
+            return
+        for row in unfinished:
+            # Give clone bots a moment to come up before their rows are sent
+            delay = max(float(row['delay_seconds']), 10)
+            self.application.job_queue.run_once(
+                callback=self._forward_quiz_to_groups,
+                when=delay,
+                name=f"forward_quiz_{row['quiz_id']}",
+                data={'quiz_id': row['quiz_id']}
+            )
+            logger.info(f"🔁 Resuming quiz {row['quiz_id']}: {row['pending']} deliveries pending, sending in {delay:.0f}s")
+    
+    async def purge_delivery_outbox(self, context: ContextTypes.DEFAULT_TYPE):
+        """Delete delivery history older than OUTBOX_RETENTION_DAYS"""
+        try:
+            deleted = await db.purge_delivery_outbox(OUTBOX_RETENTION_DAYS)
+            logger.info(f"🧹 Purged {deleted} old delivery outbox rows")
+        except Exception as e:
+            logger.error(f"Error purging delivery outbox: {e}")
+    
+    def _get_quiz_text(self, quiz_id: int, question: str, options: List[str], language: str):
+        """Return (question, options) in the chat's language, falling back to English if no translation is ready"""
+        if language != 'hindi':
+            return question, options
+        translation = quiz_translator.get(quiz_id, language)
+        if not translation:
+            return question, options
+        return translation['question'], translation['options']
     
     async def _forward_quiz_to_groups(self, context: ContextTypes.DEFAULT_TYPE):
-        """Forward quiz to all groups and channels"""
+        """Forward quiz to all groups and channels by draining its delivery outbox rows"""
+        quiz_id = context.job.data['quiz_id']
         try:
-            # Get quiz_id from job data
-            quiz_id = context.job.data['quiz_id']
-            
-            if quiz_id not in self.quiz_data:
-                logger.error(f"Quiz {quiz_id} not found in quiz_data for forwarding")
+            # Reloaded from the database when resumed after a restart or evicted
+            quiz = await quiz_registry.get(quiz_id)
+            if quiz is None:
+                logger.error(f"Quiz {quiz_id} not found for forwarding")
+                await db.cancel_quiz_deliveries(quiz_id, 'quiz not found')
                 return
             
-            quiz_data = self.quiz_data[quiz_id]
-            correct_option = quiz_data['correct_option']
+            correct_option = quiz.correct_option
             
             # Check if correct answer has been set
             if correct_option == -1:
                 logger.warning(f"Quiz {quiz_id} still has no correct answer set. Skipping forwarding.")
+                # Not resumed after a restart; setting the answer enqueues the quiz again
+                await db.cancel_quiz_deliveries(quiz_id, 'no correct answer set')
                 # Send reminder to admin
                 await context.bot.send_message(
                     chat_id=ADMIN_GROUP_ID,
@@ -906,148 +1069,140 @@ Let's ace NEET together! 🚀
                 )
                 return
             
-            # Get all active groups and channels
-            all_chats = await db.get_all_groups()
-            group_count = 0
-            channel_count = 0
+            if context.job.data.get('enqueue'):
+                # Queueing failed when the answer was set; rows already queued are left as they are
+                await db.enqueue_quiz_deliveries(quiz_id, context.bot.id, 0, exclude_chat_id=ADMIN_GROUP_ID)
+            
+            question = quiz.question
+            options = quiz.options
+            explanation = quiz.explanation
+            clone_instances = clone_manager.get_all_instances()
+            counts = {'group': 0, 'channel': 0, 'clone_group': 0, 'clone_channel': 0}
+            stats = FanoutStats()
+            claimed = 0
+            
+            def build_target(row):
+                language = row['language']
+                quiz_question, quiz_options = self._get_quiz_text(quiz_id, question, options, language)
+                if row['clone_bot_id'] is None:
+                    return {
+                        'outbox_id': row['id'],
+                        'attempts': row['attempts'],
+                        'chat_id': row['chat_id'],
+                        'type': row['chat_type'],
+                        'bot': context.bot,
+                        'clone_bot_id': None,
+                        # Add branding mention at the end of question
+                        'question': quiz_question + "\n\n【~@DrQuizRobot】",
+                        'options': quiz_options,
+                        'explanation': explanation if explanation else "📚 NEET Quiz Bot"
+                    }
+                instance = clone_instances.get(row['clone_bot_id'])
+                if not instance or not instance.application:
+                    return None
+                return {
+                    'outbox_id': row['id'],
+                    'attempts': row['attempts'],
+                    'chat_id': row['chat_id'],
+                    'type': row['chat_type'],
+                    'bot': instance.application.bot,
+                    'clone_bot_id': row['clone_bot_id'],
+                    'question': quiz_question + "\n\n【~@" + (instance.bot_username or "QuizBot") + "】",
+                    'options': quiz_options,
+                    'explanation': explanation if explanation else "📚 Quiz Bot"
+                }
             
-            poll = quiz_data['poll_object']
-            options = quiz_data['options']
+            async def send_quiz_poll(target):
+                started = asyncio.get_running_loop().time()
+                # Send new poll (not forward) with is_anonymous=False
+                sent_message = await target['bot'].send_poll(
+                    chat_id=target['chat_id'],
+                    question=target['question'],
+                    options=target['options'],
+                    type='quiz',  # Always send as quiz for answer tracking
+                    correct_option_id=correct_option,
+                    is_anonymous=False,  # Critical: allows us to track user answers
+                    explanation=target['explanation']
+                )
+                target['outcome'] = {
+                    'id': target['outbox_id'],
+                    'status': 'sent',
+                    'poll_id': sent_message.poll.id,
+                    'message_id': sent_message.message_id,
+                    'latency_ms': int((asyncio.get_running_loop().time() - started) * 1000)
+                }
+                return sent_message
+            
+            async def record_sent_poll(target, sent_message):
+                chat_kind = 'channel' if target.get('type') == 'channel' else 'group'
+                # Store poll mapping for answer tracking; buffered and written in bulk, answers
+                # resolve from memory until then and from the database after a restart
+                poll_store.add(
+                    poll_id=sent_message.poll.id,
+                    quiz_id=quiz_id,
+                    group_id=target['chat_id'],
+                    message_id=sent_message.message_id,
+                    clone_bot_id=target['clone_bot_id'],
+                    correct_option=correct_option
+                )
+                if target['clone_bot_id'] is None:
+                    counts[chat_kind] += 1
+                    logger.info(f"✅ Quiz sent to {chat_kind} {target['chat_id']} with poll_id {sent_message.poll.id}")
+                else:
+                    counts[f'clone_{chat_kind}'] += 1
             
-            for chat in all_chats:
-                if chat['id'] != ADMIN_GROUP_ID:  # Don't send back to admin group
-                    try:
-                        # Get language preference for this chat
-                        chat_language = await db.get_group_language(chat['id'])
-                        
-                        # Determine question and options based on language
-                        quiz_question = poll.question
-                        quiz_options = options
-                        
-                        # Translate to Hindi if needed
-                        if chat_language == 'hindi':
-                            # Check if translation is cached
-                            cache_key = (quiz_id, 'hindi')
-                            if cache_key in self.translation_cache:
-                                # Use cached translation
-                                quiz_question = self.translation_cache[cache_key]['question']
-                                quiz_options = self.translation_cache[cache_key]['options']
-                                logger.info(f"Using cached Hindi translation for quiz {quiz_id}")
-                            else:
-                                # Translate question and options to Hindi
-                                try:
-                                    translator = GoogleTranslator(source='auto', target='hi')
-                                    
-                                    # Translate question
-                                    quiz_question = translator.translate(poll.question)
-                                    
-                                    # Translate options
-                                    quiz_options = []
-                                    for option in options:
-                                        translated_option = translator.translate(option)
-                                        quiz_options.append(translated_option)
-                                    
-                                    # Cache the translation
-                                    self.translation_cache[cache_key] = {
-                                        'question': quiz_question,
-                                        'options': quiz_options
-                                    }
-                                    logger.info(f"Translated quiz {quiz_id} to Hindi for chat {chat['id']}")
-                                    
-                                except Exception as translation_error:
-                                    # Fallback to English if translation fails
-                                    logger.error(f"Translation error for quiz {quiz_id}: {translation_error}")
-                                    logger.warning(f"Falling back to English for chat {chat['id']}")
-                                    quiz_question = poll.question
-                                    quiz_options = options
-                        
-                        # Add branding mention at the end of question
-                        quiz_question = quiz_question + "\n\n【~@DrQuizRobot】"
-                        
-                        # Send new poll (not forward) with is_anonymous=False
-                        sent_message = await context.bot.send_poll(
-                            chat_id=chat['id'],
-                            question=quiz_question,
-                            options=quiz_options,
-                            type='quiz',  # Always send as quiz for answer tracking
-                            correct_option_id=correct_option,
-                            is_anonymous=False,  # Critical: allows us to track user answers
-                            explanation=poll.explanation if poll.explanation else "📚 NEET Quiz Bot"
-                        )
-                        
-                        # Store poll mapping for answer tracking
-                        self.poll_mapping[sent_message.poll.id] = {
-                            'quiz_id': quiz_id,
-                            'group_id': chat['id'],
-                            'message_id': sent_message.message_id
-                        }
-
-                        # Mapping store karo for /sol
-                        self.quiz_mapping[sent_message.message_id] = quiz_id
-
-                        # Count groups and channels separately
-                        if chat.get('type') == 'channel':
-                            channel_count += 1
-                            logger.info(f"✅ Quiz sent to channel {chat['id']} with poll_id {sent_message.poll.id}")
-                        else:
-                            group_count += 1
-                            logger.info(f"✅ Quiz sent to group {chat['id']} with poll_id {sent_message.poll.id}")
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Failed to send quiz to chat {chat['id']}: {e}")
-            
-            # Forward to clone bots' groups
-            clone_group_count = 0
-            clone_channel_count = 0
-            for clone_bot_id, instance in clone_manager.get_all_instances().items():
-                clone_info = await db.get_clone_bot(clone_bot_id)
-                if clone_info and clone_info.get('is_paused'):
-                    continue
-                clone_groups = await db.get_clone_groups(clone_bot_id)
-                for cgroup in clone_groups:
-                    try:
-                        clone_lang = await db.get_group_language(cgroup['id'])
-                        c_question = poll.question
-                        c_options = options
-                        if clone_lang == 'hindi':
-                            cache_key = (quiz_id, 'hindi')
-                            if cache_key in self.translation_cache:
-                                c_question = self.translation_cache[cache_key]['question']
-                                c_options = self.translation_cache[cache_key]['options']
-                            else:
-                                try:
-                                    from deep_translator import GoogleTranslator
-                                    translator = GoogleTranslator(source='auto', target='hi')
-                                    c_question = translator.translate(poll.question)
-                                    c_options = [translator.translate(opt) for opt in options]
-                                    self.translation_cache[cache_key] = {'question': c_question, 'options': c_options}
-                                except Exception:
-                                    c_question = poll.question
-                                    c_options = options
-                        c_question = c_question + "\n\n【~@" + (instance.bot_username or "QuizBot") + "】"
-                        c_sent = await instance.application.bot.send_poll(
-                            chat_id=cgroup['id'],
-                            question=c_question,
-                            options=c_options,
-                            type='quiz',
-                            correct_option_id=correct_option,
-                            is_anonymous=False,
-                            explanation=poll.explanation if poll.explanation else "📚 Quiz Bot"
-                        )
-                        await db.add_poll_mapping(
-                            poll_id=c_sent.poll.id,
-                            quiz_id=quiz_id,
-                            group_id=cgroup['id'],
-                            message_id=c_sent.message_id,
-                            clone_bot_id=clone_bot_id,
-                            correct_option=correct_option
-                        )
-                        if cgroup.get('type') == 'channel':
-                            clone_channel_count += 1
+            async def record_failed_poll(target, error):
+                if isinstance(error, RetryAfter) and target['attempts'] < RETRY_AFTER_ATTEMPTS:
+                    # Flood control, not the chat: back to 'pending' and reclaimed once the bot's limiter pause ends
+                    target['outcome'] = {'id': target['outbox_id'], 'status': 'pending', 'error': str(error)[:500]}
+                    return
+                target['outcome'] = {'id': target['outbox_id'], 'status': 'failed', 'error': str(error)[:500]}
+            
+            async def delivery_worker():
+                nonlocal claimed
+                while True:
+                    # SKIP LOCKED: workers never claim the same row twice
+                    rows = await db.claim_quiz_deliveries(quiz_id, OUTBOX_BATCH_SIZE)
+                    if not rows:
+                        return
+                    claimed += len(rows)
+                    
+                    # Translation was started at ingestion; the forwarding delay normally hides it, so this rarely waits
+                    if any(row['language'] == 'hindi' for row in rows):
+                        quiz_translator.start(quiz_id, question, options, 'hindi')
+                        await quiz_translator.wait(quiz_id, 'hindi')
+                    
+                    targets = []
+                    results = []
+                    for row in rows:
+                        target = build_target(row)
+                        if target is None:
+                            results.append({'id': row['id'], 'status': 'failed', 'error': 'Clone bot not running'})
                         else:
-                            clone_group_count += 1
-                    except Exception as ce:
-                        logger.error(f"❌ Clone {clone_bot_id}: Failed to send to {cgroup['id']}: {ce}")
+                            targets.append(target)
+                    
+                    # Each bot (main and every clone) sends in parallel within its own rate budget
+                    await fanout_engine.run(targets, send_quiz_poll, record_sent_poll,
+                                            bucket=lambda target: target['bot'].token,
+                                            on_failure=record_failed_poll, stats=stats)
+                    # Rows without an outcome stay 'sending' and are retried after a restart
+                    results.extend(target['outcome'] for target in targets if 'outcome' in target)
+                    await db.complete_deliveries(results)
+            
+            worker_results = await asyncio.gather(*(delivery_worker() for _ in range(OUTBOX_WORKERS)),
+                                                  return_exceptions=True)
+            for result in worker_results:
+                if isinstance(result, Exception):
+                    logger.error(f"Delivery worker for quiz {quiz_id} stopped: {result}")
+            await poll_store.flush()
+            
+            if claimed == 0:
+                # Already delivered (e.g. the answer was re-set and a second job fired)
+                logger.info(f"Quiz {quiz_id} has no pending deliveries")
+                return
+            
+            group_count, channel_count = counts['group'], counts['channel']
+            clone_group_count, clone_channel_count = counts['clone_group'], counts['clone_channel']
 
             total_sent = group_count + channel_count
             total_clone = clone_group_count + clone_channel_count
@@ -1057,14 +1212,16 @@ Let's ace NEET together! 🚀
                     f"🎯 **Quiz Forwarded Successfully!**\n\n"
                     f"📊 Main Bot:\n🏠 Groups: {group_count}\n📢 Channels: {channel_count}\n"
                     f"📊 Clone Bots:\n🏠 Groups: {clone_group_count}\n📢 Channels: {clone_channel_count}\n"
-                    f"📈 Total: {total_sent + total_clone}\n\n✅ Correct Answer: **{option_letter}**"
+                    f"📈 Total: {total_sent + total_clone}\n\n✅ Correct Answer: **{option_letter}**\n\n"
+                    f"{stats.summary()}"
                 )
                 await context.bot.send_message(
                     chat_id=ADMIN_GROUP_ID,
                     text=confirmation,
                     parse_mode='Markdown'
                 )
-                logger.info(f"🎯 Quiz forwarded to {group_count}g+{channel_count}c (main) + {clone_group_count}g+{clone_channel_count}c (clones)")
+                logger.info(f"🎯 Quiz forwarded to {group_count}g+{channel_count}c (main) + {clone_group_count}g+{clone_channel_count}c (clones) "
+                            f"at {stats.rate:.1f} polls/sec (p50 {stats.p50 * 1000:.0f}ms, p95 {stats.p95 * 1000:.0f}ms)")
             else:
                 await context.bot.send_message(
                     chat_id=ADMIN_GROUP_ID,
@@ -1130,20 +1287,13 @@ Let's ace NEET together! 🚀
             await message.reply_text(help_text, parse_mode='Markdown')
             return
         
-        # Find the quiz in our stored data using message_id
-        poll_message_id = reply_to_message.message_id
-        quiz_id_to_update = None
-        
-        # Search through stored quiz data using message_id for better matching
-        for quiz_id, quiz_data in self.quiz_data.items():
-            # Match by message_id for precise identification
-            if quiz_data.get('message_id') == poll_message_id:
-                quiz_id_to_update = quiz_id
-                break
+        # Find the quiz by its admin-group message_id (index lookup, database fallback)
+        quiz = await quiz_registry.find_by_message(reply_to_message.message_id, chat.id)
         
-        if quiz_id_to_update is None:
+        if quiz is None:
             await message.reply_text("❌ Could not find the quiz to update. Please try again.")
             return
+        quiz_id_to_update = quiz.quiz_id
         
         # Validate the option index against available options
         poll_options_count = len(reply_to_message.poll.options)
@@ -1152,57 +1302,64 @@ Let's ace NEET together! 🚀
             return
         
         # Update the stored quiz data with correct option
-        self.quiz_data[quiz_id_to_update]['correct_option'] = correct_option_index
+        quiz.correct_option = correct_option_index
         
         # Also update in database
         await db.update_quiz_correct_option(quiz_id_to_update, correct_option_index)
         
+        # Make sure the translation is ready (or in progress) before forwarding
+        quiz_translator.start(quiz_id_to_update, quiz.question, quiz.options, 'hindi')
+        
         # Send confirmation
         option_letter = chr(65 + correct_option_index)  # Convert to A, B, C, D
-        confirmation_text = f"✅ **Correct Answer Set!**\n\n🎯 Quiz: {reply_to_message.poll.question[:50]}...\n✅ Correct Option: **{option_letter}**\n\n⏰ **Quiz will be forwarded to all groups and channels in 30 seconds!**"
+        confirmation_text = f"✅ **Correct Answer Set!**\n\n🎯 Quiz: {reply_to_message.poll.question[:50]}...\n✅ Correct Option: **{option_letter}**\n\n⏰ **Quiz will be forwarded to all groups and channels in {QUIZ_FORWARD_DELAY} seconds!**"
         
         await message.reply_text(confirmation_text, parse_mode='Markdown')
         logger.info(f"🔧 Admin updated quiz {quiz_id_to_update} correct answer to option {correct_option_index} ({option_letter})")
         
-        # Schedule forwarding after 30 seconds
+        # Schedule forwarding after QUIZ_FORWARD_DELAY seconds
         await self._schedule_quiz_forwarding(quiz_id_to_update, context)
     
+    async def load_reply_pools(self):
+        """Rebuild the positive/negative reply pools from hardcoded messages + custom replies"""
+        for reply_type in ("positive", "negative"):
+            try:
+                custom_replies = await db.get_custom_replies(reply_type)
+            except Exception as e:
+                logger.error(f"Error loading {reply_type} custom replies: {e}")
+                continue
+            self.reply_pools[reply_type] = tuple(custom_replies) + _DEFAULT_REPLY_POOLS[reply_type]
+            self.text_reply_pools[reply_type] = _DEFAULT_TEXT_POOLS[reply_type] + tuple(
+                r['content'] for r in custom_replies if r['message_type'] == 'text'
+            )
+        logger.info(
+            f"Reply pools loaded: {len(self.reply_pools['positive'])} positive, "
+            f"{len(self.reply_pools['negative'])} negative"
+        )
+    
     async def send_quiz_reply(self, context: ContextTypes.DEFAULT_TYPE, group_id: int, user, reply_type: str):
+        """Queue a quiz reply for the group; each group's replies are paced on their own"""
+        chat_queue.submit(context.bot.id, group_id, lambda: self._deliver_quiz_reply(context.bot, group_id, user, reply_type))
+    
+    async def _deliver_quiz_reply(self, bot: Bot, group_id: int, user, reply_type: str):
         """Send quiz reply (text or media) from hardcoded messages + custom replies"""
         try:
-            # Get custom replies from database
-            custom_replies = await db.get_custom_replies(reply_type)
-            
-            # Combine hardcoded messages with custom replies for text
-            if reply_type == "positive":
-                text_replies = CORRECT_MESSAGES.copy()
-            else:
-                text_replies = WRONG_MESSAGES.copy()
-            
-            # Add custom text replies to the pool
-            custom_text_replies = [r for r in custom_replies if r['message_type'] == 'text']
-            for reply in custom_text_replies:
-                text_replies.append(reply['content'])
-            
-            # Get all reply options (text + media)
-            all_replies = custom_replies + [{'message_type': 'text', 'content': msg} for msg in (CORRECT_MESSAGES if reply_type == "positive" else WRONG_MESSAGES)]
-            
-            # Select a random reply
-            selected_reply = random.choice(all_replies)
+            # Select a random reply (text + media) from the preloaded pool
+            selected_reply = random.choice(self.reply_pools[reply_type])
             
             user_mention = f"[{user.first_name}](tg://user?id={user.id})"
             emoji = "🎉" if reply_type == "positive" else "😔"
             
             # Send based on message type
             if selected_reply['message_type'] == 'text':
-                await context.bot.send_message(
+                await bot.send_message(
                     chat_id=group_id,
                     text=f"{emoji} {user_mention} {selected_reply['content']}",
                     parse_mode='Markdown'
                 )
             elif selected_reply['message_type'] == 'photo':
                 caption = f"{emoji} {user_mention} {selected_reply.get('caption', '')}" if selected_reply.get('caption') else f"{emoji} {user_mention}"
-                await context.bot.send_photo(
+                await bot.send_photo(
                     chat_id=group_id,
                     photo=selected_reply['file_id'],
                     caption=caption,
@@ -1210,7 +1367,7 @@ Let's ace NEET together! 🚀
                 )
             elif selected_reply['message_type'] == 'video':
                 caption = f"{emoji} {user_mention} {selected_reply.get('caption', '')}" if selected_reply.get('caption') else f"{emoji} {user_mention}"
-                await context.bot.send_video(
+                await bot.send_video(
                     chat_id=group_id,
                     video=selected_reply['file_id'],
                     caption=caption,
@@ -1218,32 +1375,32 @@ Let's ace NEET together! 🚀
                 )
             elif selected_reply['message_type'] == 'document':
                 caption = f"{emoji} {user_mention} {selected_reply.get('caption', '')}" if selected_reply.get('caption') else f"{emoji} {user_mention}"
-                await context.bot.send_document(
+                await bot.send_document(
                     chat_id=group_id,
                     document=selected_reply['file_id'],
                     caption=caption,
                     parse_mode='Markdown'
                 )
             elif selected_reply['message_type'] == 'sticker':
-                await context.bot.send_sticker(
+                await bot.send_sticker(
                     chat_id=group_id,
                     sticker=selected_reply['file_id']
                 )
-                await context.bot.send_message(
+                await bot.send_message(
                     chat_id=group_id,
                     text=f"{emoji} {user_mention}",
                     parse_mode='Markdown'
                 )
             elif selected_reply['message_type'] == 'audio':
                 caption = f"{emoji} {user_mention} {selected_reply.get('caption', '')}" if selected_reply.get('caption') else f"{emoji} {user_mention}"
-                await context.bot.send_audio(
+                await bot.send_audio(
                     chat_id=group_id,
                     audio=selected_reply['file_id'],
                     caption=caption,
                     parse_mode='Markdown'
                 )
             elif selected_reply['message_type'] == 'voice':
-                await context.bot.send_voice(
+                await bot.send_voice(
                     chat_id=group_id,
                     voice=selected_reply['file_id'],
                     caption=f"{emoji} {user_mention}",
@@ -1251,31 +1408,61 @@ Let's ace NEET together! 🚀
                 )
             elif selected_reply['message_type'] == 'animation':
                 caption = f"{emoji} {user_mention} {selected_reply.get('caption', '')}" if selected_reply.get('caption') else f"{emoji} {user_mention}"
-                await context.bot.send_animation(
+                await bot.send_animation(
                     chat_id=group_id,
                     animation=selected_reply['file_id'],
                     caption=caption,
                     parse_mode='Markdown'
                 )
                 
+        except RetryAfter:
+            raise  # The chat queue waits and retries
         except Exception as e:
             logger.error(f"Error sending quiz reply: {e}")
             # Fallback to hardcoded text message
             if reply_type == "positive":
                 response = random.choice(CORRECT_MESSAGES)
-                await context.bot.send_message(
+                await bot.send_message(
                     chat_id=group_id,
                     text=f"🎉 [{user.first_name}](tg://user?id={user.id}) {response}",
                     parse_mode='Markdown'
                 )
             else:
                 response = random.choice(WRONG_MESSAGES)
-                await context.bot.send_message(
+                await bot.send_message(
                     chat_id=group_id,
                     text=f"😔 [{user.first_name}](tg://user?id={user.id}) {response}",
                     parse_mode='Markdown'
                 )
     
+    def _format_mentions(self, users: List[Dict]) -> str:
+        """Markdown mentions for a digest, capped at REPLY_DIGEST_MAX_MENTIONS"""
+        mentions = [
+            f"[{escape_markdown(u['first_name'] or 'Student')}](tg://user?id={u['id']})"
+            for u in users[:REPLY_DIGEST_MAX_MENTIONS]
+        ]
+        extra = len(users) - len(mentions)
+        return ", ".join(mentions) + (f" aur {extra} log" if extra > 0 else "")
+    
+    async def _send_reply_digest(self, bot: Bot, group_id: int, correct_users: List[Dict], wrong_users: List[Dict]):
+        """Queue one message reacting to everyone who answered a poll in this window"""
+        sections = []
+        for users, reply_type, emoji, mark, label in (
+            (correct_users, "positive", "🎉", "✅", "Sahi jawaab"),
+            (wrong_users, "negative", "😔", "❌", "Galat jawaab"),
+        ):
+            if not users:
+                continue
+            # Same pool as individual replies: hardcoded messages + custom text replies
+            sections.append(
+                f"{emoji} {random.choice(self.text_reply_pools[reply_type])}\n"
+                f"{mark} **{label} ({len(users)}):** {self._format_mentions(users)}"
+            )
+        if not sections:
+            return
+        text = "\n\n".join(sections)
+        chat_queue.submit(bot.id, group_id, lambda: bot.send_message(chat_id=group_id, text=text, parse_mode='Markdown'))
+    
     async def handle_poll_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle quiz answers"""
         poll_answer = update.poll_answer
@@ -1283,20 +1470,14 @@ Let's ace NEET together! 🚀
         poll_id = poll_answer.poll_id
         selected_options = poll_answer.option_ids
         
-        # Get poll mapping data
-        if poll_id not in self.poll_mapping:
-            return
-        
-        poll_data = self.poll_mapping[poll_id]
-        quiz_id = poll_data['quiz_id']
-        group_id = poll_data['group_id']
-        
-        # Get quiz data
-        if quiz_id not in self.quiz_data:
+        # Get poll mapping data (memory for live quizzes, database after a restart)
+        poll_data = await poll_store.get(poll_id)
+        if not poll_data:
             return
         
-        quiz_data = self.quiz_data[quiz_id]
-        correct_option = quiz_data['correct_option']
+        quiz_id = poll_data.quiz_id
+        group_id = poll_data.group_id
+        correct_option = poll_data.correct_option
         
         # Determine points
         if len(selected_options) == 0:
@@ -1309,36 +1490,38 @@ Let's ace NEET together! 🚀
             points = -1  # Wrong
             message_type = "wrong"
         
-        # Add user to database if not exists
-        await db.add_user(
-            user_id=user.id,
-            username=user.username,
-            first_name=user.first_name,
-            last_name=user.last_name
-        )
-        
-        # Add user to group if not exists
-        await db.add_group_member(user.id, group_id)
-        
         try:
-            # Record the answer with proper group_id
-            await db.record_quiz_answer(
+            # Written in batches by the answer buffer; the handler never waits on the database for it.
+            # Duplicate answers get no reply
+            if not answer_buffer.add(
                 user_id=user.id,
+                username=user.username,
+                first_name=user.first_name,
+                last_name=user.last_name,
                 group_id=group_id,
                 quiz_id=quiz_id,
                 selected_option=selected_options[0] if selected_options else -1,
                 points=points
-            )
+            ):
+                return
             
             # Send response message to the GROUP only if replies are enabled
-            replies_enabled = await db.is_group_replies_enabled(group_id)
-            if replies_enabled:
+            settings = await db.get_group_settings(group_id)
+            if settings.replies_enabled and settings.reply_digest:
+                if message_type in ("correct", "wrong"):
+                    # Digest mode: one message per poll window instead of one per answer
+                    bot = context.bot
+                    reply_digest.add(
+                        group_id, poll_id, user, message_type == "correct",
+                        lambda chat_id, correct_users, wrong_users: self._send_reply_digest(bot, chat_id, correct_users, wrong_users)
+                    )
+            elif settings.replies_enabled:
                 if message_type == "correct":
                     await self.send_quiz_reply(context, group_id, user, "positive")
                 elif message_type == "wrong":
                     await self.send_quiz_reply(context, group_id, user, "negative")
             
-            logger.info(f"Quiz answer recorded: User {user.id}, Group: {group_id}, Points: {points}")
+            logger.info(f"Quiz answer queued: User {user.id}, Group: {group_id}, Points: {points}")
             
         except Exception as e:
             logger.error(f"Error recording quiz answer: {e}")
@@ -1367,15 +1550,15 @@ Let's ace NEET together! 🚀
 
         reply_msg_id = message.reply_to_message.message_id
         
-        # Check if it's in quiz_mapping (forwarded quiz) or original quiz in admin group
+        # Original quiz in admin group, or a forwarded copy of it
         quiz_id = None
-        if reply_msg_id in self.quiz_mapping:
-            quiz_id = self.quiz_mapping[reply_msg_id]
+        quiz = await quiz_registry.find_by_message(reply_msg_id, ADMIN_GROUP_ID)
+        if quiz:
+            quiz_id = quiz.quiz_id
         else:
-            # Check if it's an original quiz in admin group
-            quiz_data = await db.get_quiz_by_message_id(reply_msg_id, ADMIN_GROUP_ID)
-            if quiz_data:
-                quiz_id = quiz_data['id']
+            poll_data = await poll_store.find_by_message(chat_id, reply_msg_id)
+            if poll_data:
+                quiz_id = poll_data.quiz_id
         
         if not quiz_id:
             await message.reply_text("⚠️ Is message ko quiz ke roop me nahi pehchana gaya.")
@@ -1438,12 +1621,13 @@ Let's ace NEET together! 🚀
             await message.reply_text(usage_text, parse_mode='Markdown')
             return
 
-        reply_msg_id = message.reply_to_message.message_id
-        if reply_msg_id not in self.quiz_mapping:
+        # Keyed by chat as well: message IDs are only unique within one chat
+        poll_data = await poll_store.find_by_message(update.effective_chat.id, message.reply_to_message.message_id)
+        if not poll_data:
             await message.reply_text("⚠️ Is message ko quiz ke roop me nahi pehchana gaya.")
             return
 
-        quiz_id = self.quiz_mapping[reply_msg_id]
+        quiz_id = poll_data.quiz_id
 
         # Get solution using new database method
         solution = await db.get_quiz_solution(quiz_id)
@@ -1470,17 +1654,7 @@ Let's ace NEET together! 🚀
             return
 
         # Send solution based on type
-        chat_id = update.effective_chat.id
-        if solution["solution_type"] == "text":
-            await message.reply_html(f"📘 <b>Solution:</b>\n\n{solution['solution_content']}")
-        elif solution["solution_type"] == "image":
-            await context.bot.send_photo(chat_id=chat_id, photo=solution["solution_content"], caption="📘 Solution")
-        elif solution["solution_type"] == "video":
-            await context.bot.send_video(chat_id=chat_id, video=solution["solution_content"], caption="📘 Solution")
-        elif solution["solution_type"] == "pdf":
-            await context.bot.send_document(chat_id=chat_id, document=solution["solution_content"], caption="📘 Solution")
-        elif solution["solution_type"] == "link":
-            await message.reply_html(f"🔗 <b>Solution Link:</b> {solution['solution_content']}")
+        await solution_sender.send(context.bot, message, solution)
     
     async def refresh_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /refresh command"""
@@ -1951,9 +2125,6 @@ Let's connect with Aman Directly, privately and securely!
                     else:
                         failed_count += 1
                     
-                    # Small delay to avoid rate limiting
-                    await asyncio.sleep(0.1)
-                    
                 except Exception as e:
                     logger.error(f"Error sending daily summary to user {user_id}: {e}")
                     failed_count += 1
@@ -2208,7 +2379,8 @@ Let's connect with Aman Directly, privately and securely!
                 f"👥 Users: {results['users']}\n"
                 f"❌ Failed: {failed_count}\n"
                 f"📈 Total Sent: {success_count}/{total_count}\n\n"
-                f"⏱️ Time: {duration} seconds"
+                f"⏱️ Time: {duration} seconds\n"
+                f"⚙️ Concurrency: {results['concurrency']} • ⚡ {results['throughput']:.1f} msg/sec"
             )
             
         except Exception as e:
@@ -2282,7 +2454,8 @@ Let's connect with Aman Directly, privately and securely!
                 f"✗ Failed: {failed_count}\n"
                 f"📱 Sent to: Users' Private Chats Only\n"
                 f"🏠 Groups: Not sent (private broadcast)\n\n"
-                f"⏱️ Time: {duration} seconds"
+                f"⏱️ Time: {duration} seconds\n"
+                f"⚙️ Concurrency: {results['concurrency']} • ⚡ {results['throughput']:.1f} msg/sec"
             )
             
         except Exception as e:
@@ -2355,7 +2528,8 @@ Let's connect with Aman Directly, privately and securely!
                 f"❌ Failed: {failed_count}\n"
                 f"📈 Total Sent: {success_count}/{total_count}\n\n"
                 f"👤 Sender name: Visible\n"
-                f"⏱️ Time: {duration} seconds"
+                f"⏱️ Time: {duration} seconds\n"
+                f"⚙️ Concurrency: {results['concurrency']} • ⚡ {results['throughput']:.1f} msg/sec"
             )
             
         except Exception as e:
@@ -2432,6 +2606,7 @@ Let's connect with Aman Directly, privately and securely!
                 f"   ❌ Failed: {failed_count}\n"
                 f"   📝 Total in cache: {len(self.groups_cache)}\n\n"
                 f"⏱️ Time: {duration} seconds\n"
+                f"⚙️ Concurrency: {results['concurrency']} • ⚡ {results['throughput']:.1f} msg/sec\n"
                 f"⚠️ **Note:** Used in-memory cache (no database required)"
             )
         
@@ -2502,7 +2677,8 @@ Let's connect with Aman Directly, privately and securely!
                 f"❌ Failed: {failed_count}\n"
                 f"📈 Total Sent: {success_count}/{len(groups)}\n\n"
                 f"👤 Private Chats: Not sent (group broadcast)\n"
-                f"⏱️ Time: {duration} seconds"
+                f"⏱️ Time: {duration} seconds\n"
+                f"⚙️ Concurrency: {results['concurrency']} • ⚡ {results['throughput']:.1f} msg/sec"
             )
             
         except Exception as e:
@@ -2564,6 +2740,20 @@ Let's connect with Aman Directly, privately and securely!
         
         try:
             stats = await db.get_bot_stats()
+            phrases = quiz_translator.phrase_stats()
+            queues = chat_queue.stats()
+            answers = answer_buffer.stats()
+            polls = poll_store.stats()
+            suppressed = db.write_suppression_stats()
+            hot_chats = "".join(
+                f"\n• `{c['chat_id']}`: {c['depth']} queued, {c['dropped']} dropped"
+                for c in queues['hot']
+            )
+            send_rates = "\n".join(
+                f"• {limiter.name}: {s['requests']} sent, {s['throttled']} throttled "
+                f"(avg {s['avg_wait'] * 1000:.0f} ms), {s['retry_after_hits']} × 429 @ {s['rate']:.0f}/s, {s['priority']} priority replies"
+                for limiter, s in ((limiter, limiter.stats()) for limiter in rate_limiters.values())
+            )
             
             stats_text = f"""
 📊 **Bot Statistics**
@@ -2573,6 +2763,20 @@ Let's connect with Aman Directly, privately and securely!
 ❓ **Total Quizzes:** {stats['total_quizzes']}
 ✏️ **Total Answers:** {stats['total_answers']}
 
+🌐 **Phrase Memo:** {phrases['hit_rate']:.0f}% hits ({phrases['hits']} saved, {phrases['misses']} missed, {phrases['size']} cached)
+🔤 **Translator Requests:** {phrases['translator_requests']}
+
+🚦 **Send Rate Limits:**
+{send_rates}
+
+📝 **Answer Buffer:** {answers['backlog']} pending, {answers['answers_flushed']} written in {answers['batches']} batches (avg {answers['avg_batch']:.0f})
+⏱️ **Answer Flush:** avg {answers['avg_flush_ms']:.0f} ms, max {answers['max_flush_ms']:.0f} ms, {answers['failures']} failed, {answers['dropped']} dropped
+🗳️ **Poll Lookups:** {polls['hits']} from memory, {polls['misses']} from DB ({polls['cached']} cached, {polls['backlog']} unflushed)
+📘 **Solutions:** {solution_sender.reused} file_id reuses, {solution_sender.uploads} clone uploads
+🧠 **Skipped Writes:** {suppressed['profiles_skipped']} profiles, {suppressed['memberships_skipped']} memberships, {suppressed['groups_skipped']} chat updates ({suppressed['profiles_cached']} users, {suppressed['memberships_cached']} memberships, {suppressed['groups_cached']} chats cached)
+
+📮 **Reply Queues:** {queues['chats']} chats, {queues['depth']} queued, {queues['sent']} sent, {queues['dropped']} dropped, {queues['failed']} failed{hot_chats}
+
 🕒 **Last Updated:** {datetime.now(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S IST')}
             """
             
@@ -2783,6 +2987,8 @@ Let's connect with Aman Directly, privately and securely!
                 added_by=user.id
             )
             
+            await self.load_reply_pools()
+            
             await update.message.reply_text(f"✅ Positive reply added successfully! (ID: {reply_id})")
             logger.info(f"Admin {user.id} added positive reply: {message_type}")
             
@@ -2853,6 +3059,8 @@ Let's connect with Aman Directly, privately and securely!
                 added_by=user.id
             )
             
+            await self.load_reply_pools()
+            
             await update.message.reply_text(f"✅ Negative reply added successfully! (ID: {reply_id})")
             logger.info(f"Admin {user.id} added negative reply: {message_type}")
             
@@ -2901,6 +3109,7 @@ Let's connect with Aman Directly, privately and securely!
             deleted_count = await db.remove_custom_reply(content=content, file_id=file_id)
             
             if deleted_count > 0:
+                await self.load_reply_pools()
                 await update.message.reply_text(f"✅ Custom reply removed successfully! ({deleted_count} entries deleted)")
                 logger.info(f"Admin {user.id} removed {deleted_count} custom reply(ies)")
             else:
@@ -2996,6 +3205,61 @@ Let's connect with Aman Directly, privately and securely!
         )
         logger.info(f"User {user.id} enabled replies in group {chat.id}")
     
+    async def replydigest_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /replydigest on|off - one coalesced reply per quiz instead of one per answer (admin/group admin only)"""
+        user = update.effective_user
+        chat = update.effective_chat
+        
+        # Only works in groups
+        if chat.type not in ['group', 'supergroup']:
+            await update.message.reply_text("❌ This command can only be used in groups.")
+            return
+        
+        # Check if user is bot admin or group admin
+        is_bot_admin = await db.is_admin(user.id)
+        try:
+            member = await context.bot.get_chat_member(chat.id, user.id)
+            is_group_admin = member.status in ['creator', 'administrator']
+        except:
+            is_group_admin = False
+        
+        if not is_bot_admin and not is_group_admin:
+            await update.message.reply_text(
+                "🚫 **𝗔𝗖𝗖𝗘𝗦𝗦 𝗗𝗘𝗡𝗜𝗘𝗗**\n\n"
+                "❌ 𝙏𝙝𝙞𝙨 𝙘𝙤𝙢𝙢𝙖𝙣𝙙 𝙞𝙨 𝙤𝙣𝙡𝙮 𝙛𝙤𝙧 𝙖𝙙𝙢𝙞𝙣𝙨!\n\n"
+                "👮‍♂️ Only group admins and bot admins can use this command.",
+                parse_mode='Markdown'
+            )
+            return
+        
+        mode = context.args[0].lower() if context.args else None
+        if mode not in ('on', 'off'):
+            settings = await db.get_group_settings(chat.id)
+            await update.message.reply_text(
+                f"📨 **Reply Digest:** {'ON' if settings.reply_digest else 'OFF'}\n\n"
+                f"Usage: `/replydigest on` or `/replydigest off`\n\n"
+                f"When ON, the bot sends one message per quiz (every {REPLY_DIGEST_WINDOW:.0f}s) "
+                f"mentioning everyone who answered right or wrong, instead of one reply per answer.",
+                parse_mode='Markdown'
+            )
+            return
+        
+        await db.set_group_reply_digest(chat.id, mode == 'on')
+        if mode == 'on':
+            text = (
+                "📨 **𝗥𝗘𝗣𝗟𝗬 𝗗𝗜𝗚𝗘𝗦𝗧 𝗢𝗡**\n\n"
+                f"✅ Quiz replies will now be combined into one message per quiz every {REPLY_DIGEST_WINDOW:.0f} seconds.\n\n"
+                "🔔 Use /replydigest off for individual replies again."
+            )
+        else:
+            text = (
+                "💬 **𝗥𝗘𝗣𝗟𝗬 𝗗𝗜𝗚𝗘𝗦𝗧 𝗢𝗙𝗙**\n\n"
+                "✅ Each answer will get its own reply again.\n\n"
+                "📨 Use /replydigest on to combine replies."
+            )
+        await update.message.reply_text(text, parse_mode='Markdown')
+        logger.info(f"User {user.id} set reply digest {mode} in group {chat.id}")
+    
     async def language_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /language command - set quiz language preference"""
         user = update.effective_user
@@ -4144,17 +4408,49 @@ Let's connect with Aman Directly, privately and securely!
             await self.application.start()
             await self.application.updater.start_polling()
             
+            # Pick up quizzes whose delivery was cut short by the last shutdown
+            await self._resume_deliveries()
+            
             logger.info("NEET Quiz Bot started successfully!")
             
-            # Keep running
-            await asyncio.Event().wait()
+            # Keep running until Render/Replit send SIGTERM (or Ctrl+C), then fall through to the cleanup below
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                try:
+                    loop.add_signal_handler(sig, stop.set)
+                except (NotImplementedError, RuntimeError):
+                    pass  # No signal handlers on this platform/thread
+            await stop.wait()
+            logger.info("Shutdown signal received, stopping bot...")
             
         except Exception as e:
             logger.error(f"Bot error: {e}")
         finally:
-            # Cleanup
+            # Cleanup: stop taking updates on every bot first, so nothing is buffered after the flush
+            clean = self.application is not None
+            try:
+                if self.application and self.application.updater and self.application.updater.running:
+                    await self.application.updater.stop()
+            except Exception as e:
+                clean = False
+                logger.error(f"Error stopping updater: {e}")
+            await clone_manager.stop_all_clones()
+            # Write everything still buffered before exiting
+            await answer_buffer.flush()
+            await poll_store.flush()
+            quiz_translator.shutdown()
             if self.application:
-                await self.application.stop()
+                try:
+                    # Waits for handlers still running; flush again for whatever they buffered
+                    await self.application.stop()
+                    await answer_buffer.flush()
+                    await poll_store.flush()
+                except Exception as e:
+                    clean = False
+                    logger.error(f"Error stopping application: {e}")
+                # Only a fully stopped bot writes a clean snapshot (whose group settings are trusted)
+                await self.save_snapshot(clean=clean)
 
 # Main execution
 async def main():
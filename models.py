@@ -5,11 +5,41 @@ import logging
 import os
 import time
 from datetime import datetime, timezone
-from typing import Optional, List, Dict, Union
+from typing import Optional, List, Dict, Tuple, Union
+
+from cachetools import LRUCache, TTLCache
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
+# Rows known to be up to date in users / group_members; matching writes are skipped
+PROFILE_CACHE_SIZE = int(os.environ.get("PROFILE_CACHE_SIZE", 100000))
+MEMBERSHIP_CACHE_SIZE = int(os.environ.get("MEMBERSHIP_CACHE_SIZE", 200000))
+# Chats seen in track_groups are re-persisted at most this often unless their title/type changes
+GROUP_HEARTBEAT_SECONDS = int(os.environ.get("GROUP_HEARTBEAT_SECONDS", 3600))
+GROUP_REGISTRY_SIZE = int(os.environ.get("GROUP_REGISTRY_SIZE", 50000))
+# Quiz solutions served by /sol; /setsol invalidates its quiz, the TTL bounds anything else
+SOLUTION_CACHE_SIZE = int(os.environ.get("SOLUTION_CACHE_SIZE", 2000))
+SOLUTION_CACHE_TTL = int(os.environ.get("SOLUTION_CACHE_TTL", 600))
+
+class GroupSettings:
+    """Settings of one group/channel, cached in Database for hot paths like poll answers"""
+
+    def __init__(self, group_id: int, chat_type: Optional[str] = None, language: str = 'english',
+                 replies_enabled: bool = True, reply_digest: bool = False, clone_bot_id: Optional[int] = None):
+        self.id = group_id
+        self.type = chat_type
+        self.language = language
+        self.replies_enabled = replies_enabled
+        self.reply_digest = reply_digest
+        self.clone_bot_id = clone_bot_id
+
+    @classmethod
+    def from_row(cls, row) -> 'GroupSettings':
+        return cls(row['id'], row['type'], row['language_preference'], row['replies_enabled'],
+                   row['reply_digest'], row['clone_bot_id'])
+
+
 class Database:
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
@@ -20,6 +50,19 @@ class Database:
             'group_language': 60,  # 1 minute per group
             'admin_list': 300,  # 5 minutes
         }
+        # Write suppression: {user_id: (profile_hash, has_clone_bot)} and {(user_id, group_id): True}
+        self._profiles: LRUCache = LRUCache(maxsize=PROFILE_CACHE_SIZE)
+        self._memberships: LRUCache = LRUCache(maxsize=MEMBERSHIP_CACHE_SIZE)
+        self.profile_writes_skipped = 0
+        self.membership_writes_skipped = 0
+        # Chat registry: {group_id: (title, type, has_clone_bot, persisted_at)}
+        self._groups: LRUCache = LRUCache(maxsize=GROUP_REGISTRY_SIZE)
+        self.group_writes_skipped = 0
+        # {group_id: GroupSettings}; no TTL, setters invalidate their group explicitly
+        self._group_settings: LRUCache = LRUCache(maxsize=GROUP_REGISTRY_SIZE)
+        # {quiz_id: solution dict or None}; concurrent misses for one quiz share one query
+        self._solutions: TTLCache = TTLCache(maxsize=SOLUTION_CACHE_SIZE, ttl=SOLUTION_CACHE_TTL)
+        self._solution_loads: Dict[int, asyncio.Task] = {}
     
     def _get_cache(self, key: str) -> Optional[any]:
         """Get value from cache if not expired"""
@@ -40,6 +83,32 @@ class Database:
         if key in self._cache:
             del self._cache[key]
     
+    def _profile_unchanged(self, user_id: int, username: Optional[str], first_name: Optional[str],
+                           last_name: Optional[str], clone_bot_id: Optional[int]) -> bool:
+        """True if the users row already holds this profile (clone_bot_id is only ever set once)"""
+        cached = self._profiles.get(user_id)
+        if cached is None:
+            return False
+        profile_hash, has_clone_bot = cached
+        return profile_hash == hash((username, first_name, last_name)) and (clone_bot_id is None or has_clone_bot)
+    
+    def _remember_profile(self, user_id: int, username: Optional[str], first_name: Optional[str],
+                          last_name: Optional[str], clone_bot_id: Optional[int]):
+        cached = self._profiles.get(user_id)
+        has_clone_bot = clone_bot_id is not None or (cached is not None and cached[1])
+        self._profiles[user_id] = (hash((username, first_name, last_name)), has_clone_bot)
+    
+    def write_suppression_stats(self) -> Dict:
+        """Skipped users/group_members writes and cache sizes"""
+        return {
+            'profiles_skipped': self.profile_writes_skipped,
+            'memberships_skipped': self.membership_writes_skipped,
+            'profiles_cached': len(self._profiles),
+            'memberships_cached': len(self._memberships),
+            'groups_skipped': self.group_writes_skipped,
+            'groups_cached': len(self._groups)
+        }
+    
     async def init_pool(self):
         """Initialize database connection pool with aggressive timeouts to reduce Neon DB compute hours"""
         self.pool = await asyncpg.create_pool(
@@ -139,6 +208,19 @@ class Database:
                 END $$;
             """)
 
+            # Migration: Add reply_digest to groups (one coalesced reply message per poll window)
+            await conn.execute("""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_name='groups' AND column_name='reply_digest'
+                    ) THEN
+                        ALTER TABLE groups ADD COLUMN reply_digest BOOLEAN DEFAULT FALSE;
+                    END IF;
+                END $$;
+            """)
+
             # Migration: Add clone_bot_id to users
             await conn.execute("""
                 DO $$
@@ -222,6 +304,19 @@ class Database:
                 )
             """)
 
+            # Migration: Add explanation to quizzes (needed to resume deliveries after a restart)
+            await conn.execute("""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_name='quizzes' AND column_name='explanation'
+                    ) THEN
+                        ALTER TABLE quizzes ADD COLUMN explanation TEXT DEFAULT NULL;
+                    END IF;
+                END $$;
+            """)
+
 
             
             # User scores per quiz
@@ -326,9 +421,72 @@ class Database:
                 ON button_posts(user_id)
             """)
 
+            # Translated quizzes (persisted so restarts never re-translate)
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS quiz_translations (
+                    quiz_id INTEGER REFERENCES quizzes(id) ON DELETE CASCADE,
+                    language TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    options JSONB NOT NULL,
+                    created_at TIMESTAMP DEFAULT NOW(),
+                    PRIMARY KEY (quiz_id, language)
+                )
+            """)
+
+            # Phrase-level translation memo for option text that repeats across quizzes
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS translation_phrases (
+                    phrase_hash TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    source_text TEXT NOT NULL,
+                    translated_text TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT NOW(),
+                    PRIMARY KEY (phrase_hash, language)
+                )
+            """)
+
+            # Quiz delivery outbox: one row per (quiz, chat, bot), written when the quiz is scheduled
+            # status: pending -> sending -> sent / failed
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS delivery_outbox (
+                    id BIGSERIAL PRIMARY KEY,
+                    quiz_id INTEGER REFERENCES quizzes(id) ON DELETE CASCADE,
+                    chat_id BIGINT NOT NULL,
+                    bot_id BIGINT NOT NULL,
+                    clone_bot_id BIGINT DEFAULT NULL,
+                    chat_type TEXT,
+                    language TEXT DEFAULT 'english',
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    deliver_after TIMESTAMP NOT NULL DEFAULT NOW(),
+                    claimed_at TIMESTAMP,
+                    sent_at TIMESTAMP,
+                    poll_id TEXT,
+                    message_id BIGINT,
+                    latency_ms INTEGER,
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT NOW(),
+                    UNIQUE (quiz_id, chat_id, bot_id)
+                )
+            """)
+
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_delivery_outbox_status
+                ON delivery_outbox(status, quiz_id)
+            """)
+
+            # /sol resolves the replied-to poll by (chat, message)
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_poll_mappings_group_message
+                ON poll_mappings(group_id, message_id)
+            """)
+
     
     async def add_user(self, user_id: int, username: Optional[str] = None, first_name: Optional[str] = None, last_name: Optional[str] = None, clone_bot_id: Optional[int] = None):
-        """Add or update user in database"""
+        """Add or update user in database (skipped when the stored profile is already identical)"""
+        if self._profile_unchanged(user_id, username, first_name, last_name, clone_bot_id):
+            self.profile_writes_skipped += 1
+            return
         if not self.pool:
             raise RuntimeError("Database pool not initialized")
         async with self.pool.acquire() as conn:
@@ -342,6 +500,7 @@ class Database:
                     clone_bot_id = COALESCE(users.clone_bot_id, EXCLUDED.clone_bot_id),
                     updated_at = NOW()
             """, user_id, username, first_name, last_name, clone_bot_id)
+        self._remember_profile(user_id, username, first_name, last_name, clone_bot_id)
     
     async def get_user(self, user_id: int) -> Optional[Dict]:
         """Get user data by user ID"""
@@ -371,9 +530,38 @@ class Database:
                     clone_bot_id = COALESCE(groups.clone_bot_id, EXCLUDED.clone_bot_id),
                     updated_at = NOW()
             """, group_id, title, group_type, clone_bot_id)
+        known = self._groups.get(group_id)
+        has_clone_bot = clone_bot_id is not None or (known is not None and known[2])
+        self._groups[group_id] = (title, group_type, has_clone_bot, time.time())
+        settings = self._group_settings.get(group_id)
+        if settings:
+            settings.type = group_type
+            if settings.clone_bot_id is None:
+                settings.clone_bot_id = clone_bot_id
+    
+    async def touch_group(self, group_id: int, title: str, group_type: str, clone_bot_id: Optional[int] = None) -> bool:
+        """
+        Register activity in a chat, writing only on first sight, a title/type change or an hourly heartbeat.
+
+        Returns:
+            True if the groups row was written
+        """
+        known = self._groups.get(group_id)
+        if known is not None:
+            known_title, known_type, has_clone_bot, persisted_at = known
+            if (known_title == title and known_type == group_type
+                    and (clone_bot_id is None or has_clone_bot)
+                    and time.time() - persisted_at < GROUP_HEARTBEAT_SECONDS):
+                self.group_writes_skipped += 1
+                return False
+        await self.add_group(group_id, title, group_type, clone_bot_id)
+        return True
     
     async def add_group_member(self, user_id: int, group_id: int):
-        """Add user to group"""
+        """Add user to group (skipped for memberships already known)"""
+        if (user_id, group_id) in self._memberships:
+            self.membership_writes_skipped += 1
+            return
         if not self.pool:
             raise RuntimeError("Database pool not initialized")
         async with self.pool.acquire() as conn:
@@ -382,6 +570,7 @@ class Database:
                 VALUES ($1, $2)
                 ON CONFLICT (user_id, group_id) DO NOTHING
             """, user_id, group_id)
+        self._memberships[(user_id, group_id)] = True
     
     async def is_admin(self, user_id: int) -> bool:
         """Check if user is admin"""
@@ -419,17 +608,30 @@ class Database:
             rows = await conn.fetch("SELECT * FROM admins ORDER BY created_at")
             return [dict(row) for row in rows]
     
-    async def add_quiz(self, message_id: int, from_group_id: int, quiz_text: str, correct_option: int, options: List[str]) -> int:
+    async def add_quiz(self, message_id: int, from_group_id: int, quiz_text: str, correct_option: int, options: List[str],
+                       explanation: Optional[str] = None) -> int:
         """Add quiz to database and return quiz_id"""
         if not self.pool:
             raise RuntimeError("Database pool not initialized")
         async with self.pool.acquire() as conn:
             quiz_id = await conn.fetchval("""
-                INSERT INTO quizzes (message_id, from_group_id, quiz_text, correct_option, options)
-                VALUES ($1, $2, $3, $4, $5::jsonb)
+                INSERT INTO quizzes (message_id, from_group_id, quiz_text, correct_option, options, explanation)
+                VALUES ($1, $2, $3, $4, $5::jsonb, $6)
                 RETURNING id
-            """, message_id, from_group_id, quiz_text, correct_option, json.dumps(options))
+            """, message_id, from_group_id, quiz_text, correct_option, json.dumps(options), explanation)
             return quiz_id
+
+    async def get_quiz(self, quiz_id: int) -> Optional[Dict]:
+        """Get a quiz by id with its options decoded"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT * FROM quizzes WHERE id = $1", quiz_id)
+            if not row:
+                return None
+            quiz = dict(row)
+            quiz['options'] = json.loads(quiz['options']) if isinstance(quiz['options'], str) else quiz['options']
+            return quiz
     
     async def update_quiz_correct_option(self, quiz_id: int, correct_option: int):
         """Update correct option for an existing quiz"""
@@ -441,27 +643,100 @@ class Database:
                 WHERE id = $1
             """, quiz_id, correct_option)
     
-    async def record_quiz_answer(self, user_id: int, group_id: int, quiz_id: int, selected_option: int, points: int):
-        """Record user's quiz answer"""
+    async def ingest_answers(self, answers: List[Dict]) -> int:
+        """
+        Record a batch of quiz answers in one transaction.
+
+        Users are upserted once each, memberships and scores are inserted with unnest(), and
+        each user's counters get a single UPDATE aggregated from the score rows actually
+        inserted (duplicates add nothing). Profiles and memberships already known to be
+        stored are left out of the upserts.
+
+        Args:
+            answers: Dicts with user_id, username, first_name, last_name, clone_bot_id,
+                     group_id, quiz_id, selected_option, points
+
+        Returns:
+            Number of score rows inserted
+        """
+        if not answers:
+            return 0
         if not self.pool:
             raise RuntimeError("Database pool not initialized")
+        # ON CONFLICT DO UPDATE cannot touch a row twice in one statement: one profile per user (latest wins)
+        latest = {a['user_id']: a for a in answers}
+        users = {
+            user_id: a for user_id, a in latest.items()
+            if not self._profile_unchanged(user_id, a['username'], a['first_name'], a['last_name'], a.get('clone_bot_id'))
+        }
+        seen_members = {(a['user_id'], a['group_id']) for a in answers}
+        members = [m for m in seen_members if m not in self._memberships]
         async with self.pool.acquire() as conn:
-            await conn.execute("""
-                INSERT INTO user_quiz_scores (user_id, group_id, quiz_id, selected_option, points)
-                VALUES ($1, $2, $3, $4, $5)
-                ON CONFLICT (user_id, quiz_id, group_id) DO NOTHING
-            """, user_id, group_id, quiz_id, selected_option, points)
-            
-            # Update user total score
-            await conn.execute("""
-                UPDATE users SET 
-                    total_score = total_score + $2,
-                    correct_answers = correct_answers + CASE WHEN $2 = 4 THEN 1 ELSE 0 END,
-                    wrong_answers = wrong_answers + CASE WHEN $2 = -1 THEN 1 ELSE 0 END,
-                    unattempted = unattempted + CASE WHEN $2 = 0 THEN 1 ELSE 0 END,
-                    updated_at = NOW()
-                WHERE id = $1
-            """, user_id, points)
+            async with conn.transaction():
+                if users:
+                    await conn.execute("""
+                        INSERT INTO users (id, username, first_name, last_name, clone_bot_id, updated_at)
+                        SELECT id, username, first_name, last_name, clone_bot_id, NOW()
+                        FROM unnest($1::bigint[], $2::text[], $3::text[], $4::text[], $5::bigint[])
+                             AS u(id, username, first_name, last_name, clone_bot_id)
+                        ON CONFLICT (id) DO UPDATE SET
+                            username = EXCLUDED.username,
+                            first_name = EXCLUDED.first_name,
+                            last_name = EXCLUDED.last_name,
+                            clone_bot_id = COALESCE(users.clone_bot_id, EXCLUDED.clone_bot_id),
+                            updated_at = NOW()
+                    """,
+                        list(users),
+                        [u['username'] for u in users.values()],
+                        [u['first_name'] for u in users.values()],
+                        [u['last_name'] for u in users.values()],
+                        [u.get('clone_bot_id') for u in users.values()])
+                if members:
+                    await conn.execute("""
+                        INSERT INTO group_members (user_id, group_id)
+                        SELECT * FROM unnest($1::bigint[], $2::bigint[])
+                        ON CONFLICT (user_id, group_id) DO NOTHING
+                    """, [m[0] for m in members], [m[1] for m in members])
+                inserted = await conn.fetchval("""
+                    WITH score AS (
+                        INSERT INTO user_quiz_scores (user_id, group_id, quiz_id, selected_option, points)
+                        SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::int[], $4::int[], $5::int[])
+                        ON CONFLICT (user_id, quiz_id, group_id) DO NOTHING
+                        RETURNING user_id, points
+                    ),
+                    totals AS (
+                        SELECT user_id,
+                               SUM(points) AS total_score,
+                               COUNT(*) FILTER (WHERE points = 4) AS correct_answers,
+                               COUNT(*) FILTER (WHERE points = -1) AS wrong_answers,
+                               COUNT(*) FILTER (WHERE points = 0) AS unattempted
+                        FROM score
+                        GROUP BY user_id
+                    ),
+                    counters AS (
+                        UPDATE users u SET
+                            total_score = u.total_score + t.total_score,
+                            correct_answers = u.correct_answers + t.correct_answers,
+                            wrong_answers = u.wrong_answers + t.wrong_answers,
+                            unattempted = u.unattempted + t.unattempted
+                        FROM totals t
+                        WHERE u.id = t.user_id
+                    )
+                    SELECT COUNT(*) FROM score
+                """,
+                    [a['user_id'] for a in answers],
+                    [a['group_id'] for a in answers],
+                    [a['quiz_id'] for a in answers],
+                    [a['selected_option'] for a in answers],
+                    [a['points'] for a in answers])
+        # Only remembered once committed, so a failed batch is written in full on retry
+        for user_id, a in users.items():
+            self._remember_profile(user_id, a['username'], a['first_name'], a['last_name'], a.get('clone_bot_id'))
+        for member in members:
+            self._memberships[member] = True
+        self.profile_writes_skipped += len(latest) - len(users)
+        self.membership_writes_skipped += len(seen_members) - len(members)
+        return inserted
     
     async def get_group_leaderboard(self, group_id: int) -> List[Dict]:
         """Get leaderboard for specific group"""
@@ -527,6 +802,60 @@ class Database:
             rows = await conn.fetch("SELECT * FROM groups WHERE is_active = TRUE")
             return [dict(row) for row in rows]
     
+    async def get_chat_settings_snapshot(self) -> List[Dict]:
+        """Get id, type, language and reply settings of every active chat in one query"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT id, type,
+                       COALESCE(language_preference, 'english') AS language_preference,
+                       COALESCE(replies_enabled, TRUE) AS replies_enabled,
+                       COALESCE(reply_digest, FALSE) AS reply_digest,
+                       clone_bot_id
+                FROM groups
+                WHERE is_active = TRUE
+            """)
+            return [dict(row) for row in rows]
+    
+    async def warm_group_settings(self) -> int:
+        """Load settings of every active chat into the cache in one query (called at startup)"""
+        rows = await self.get_chat_settings_snapshot()
+        for row in rows:
+            self._group_settings[row['id']] = GroupSettings.from_row(row)
+        return len(rows)
+    
+    def snapshot_group_settings(self) -> List[List]:
+        """Cached group settings as rows, for the warm-restart snapshot"""
+        return [[s.id, s.type, s.language, s.replies_enabled, s.reply_digest, s.clone_bot_id]
+                for s in self._group_settings.values()]
+    
+    def restore_group_settings(self, rows: List[List]):
+        """Refill the group settings cache from snapshot rows"""
+        for row in rows:
+            self._group_settings[row[0]] = GroupSettings(*row)
+    
+    async def get_group_settings(self, group_id: int) -> GroupSettings:
+        """Get a group's settings, from the cache when possible (unknown groups get defaults)"""
+        settings = self._group_settings.get(group_id)
+        if settings is not None:
+            return settings
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                SELECT id, type,
+                       COALESCE(language_preference, 'english') AS language_preference,
+                       COALESCE(replies_enabled, TRUE) AS replies_enabled,
+                       COALESCE(reply_digest, FALSE) AS reply_digest,
+                       clone_bot_id
+                FROM groups
+                WHERE id = $1
+            """, group_id)
+        settings = GroupSettings.from_row(row) if row else GroupSettings(group_id)
+        self._group_settings[group_id] = settings
+        return settings
+    
     async def get_all_users(self) -> List[Dict]:
         """Get all users who have interacted with the bot"""
         if not self.pool:
@@ -599,18 +928,37 @@ class Database:
                     solution_content = $3,
                     updated_at = NOW()
             """, quiz_id, solution_type, solution_content)
+        self._solutions.pop(quiz_id, None)
+        # A load still in flight read the old solution; don't let it fill the cache
+        self._solution_loads.pop(quiz_id, None)
     
     async def get_quiz_solution(self, quiz_id: int) -> Optional[Dict]:
-        """Get solution for a quiz"""
-        if not self.pool:
-            raise RuntimeError("Database pool not initialized")
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow("""
-                SELECT solution_type, solution_content, updated_at
-                FROM quiz_solutions
-                WHERE quiz_id = $1
-            """, quiz_id)
-            return dict(row) if row else None
+        """Get solution for a quiz (cached; a burst of /sol for one quiz costs one query)"""
+        if quiz_id in self._solutions:
+            return self._solutions[quiz_id]
+        load = self._solution_loads.get(quiz_id)
+        if load is None:
+            load = self._solution_loads[quiz_id] = asyncio.create_task(self._load_quiz_solution(quiz_id))
+        return await asyncio.shield(load)
+    
+    async def _load_quiz_solution(self, quiz_id: int) -> Optional[Dict]:
+        current = asyncio.current_task()
+        try:
+            if not self.pool:
+                raise RuntimeError("Database pool not initialized")
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow("""
+                    SELECT solution_type, solution_content, updated_at
+                    FROM quiz_solutions
+                    WHERE quiz_id = $1
+                """, quiz_id)
+            solution = dict(row) if row else None
+            if self._solution_loads.get(quiz_id) is current:
+                self._solutions[quiz_id] = solution
+            return solution
+        finally:
+            if self._solution_loads.get(quiz_id) is current:
+                del self._solution_loads[quiz_id]
     
     async def get_quiz_by_message_id(self, message_id: int, group_id: int) -> Optional[Dict]:
         """Get quiz by message ID from specific group"""
@@ -624,6 +972,60 @@ class Database:
             """, message_id, group_id)
             return dict(row) if row else None
     
+    async def get_quiz_translations(self, quiz_ids: List[int], language: str) -> Dict[int, Dict]:
+        """Get stored translations {quiz_id: {'question', 'options'}} for several quizzes"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT quiz_id, question, options FROM quiz_translations
+                WHERE quiz_id = ANY($1::int[]) AND language = $2
+            """, quiz_ids, language)
+            translations = {}
+            for row in rows:
+                options = row['options']
+                translations[row['quiz_id']] = {
+                    'question': row['question'],
+                    'options': json.loads(options) if isinstance(options, str) else options
+                }
+            return translations
+    
+    async def save_quiz_translations(self, language: str, translations: Dict[int, Dict]):
+        """Store translations {quiz_id: {'question', 'options'}} in one batch"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            await conn.executemany("""
+                INSERT INTO quiz_translations (quiz_id, language, question, options)
+                VALUES ($1, $2, $3, $4::jsonb)
+                ON CONFLICT (quiz_id, language) DO UPDATE SET
+                    question = EXCLUDED.question,
+                    options = EXCLUDED.options
+            """, [(quiz_id, language, t['question'], json.dumps(t['options'])) for quiz_id, t in translations.items()])
+    
+    async def get_translation_phrases(self, limit: int) -> List[Dict]:
+        """Get the most recent memoized phrase translations (preloaded at startup)"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT phrase_hash, language, translated_text FROM translation_phrases
+                ORDER BY created_at DESC
+                LIMIT $1
+            """, limit)
+            return [dict(row) for row in rows]
+    
+    async def save_translation_phrases(self, language: str, phrases: List[tuple]):
+        """Store memoized phrases as (phrase_hash, source_text, translated_text) tuples"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            await conn.executemany("""
+                INSERT INTO translation_phrases (phrase_hash, language, source_text, translated_text)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (phrase_hash, language) DO NOTHING
+            """, [(phrase_hash, language, source, translated) for phrase_hash, source, translated in phrases])
+    
     async def add_custom_reply(self, reply_type: str, message_type: str, content: Optional[str] = None, 
                               file_id: Optional[str] = None, caption: Optional[str] = None, added_by: Optional[int] = None) -> int:
         """Add custom reply to database"""
@@ -679,16 +1081,22 @@ class Database:
                 UPDATE groups SET replies_enabled = $2, updated_at = NOW()
                 WHERE id = $1
             """, group_id, enabled)
+        self._group_settings.pop(group_id, None)
     
     async def is_group_replies_enabled(self, group_id: int) -> bool:
-        """Check if replies are enabled for a group"""
+        """Check if replies are enabled for a group (cached)"""
+        return (await self.get_group_settings(group_id)).replies_enabled
+    
+    async def set_group_reply_digest(self, group_id: int, enabled: bool):
+        """Enable or disable digest mode (one reply message per poll window) for a group"""
         if not self.pool:
             raise RuntimeError("Database pool not initialized")
         async with self.pool.acquire() as conn:
-            result = await conn.fetchval("""
-                SELECT replies_enabled FROM groups WHERE id = $1
-            """, group_id)
-            return result if result is not None else True
+            await conn.execute("""
+                UPDATE groups SET reply_digest = $2, updated_at = NOW()
+                WHERE id = $1
+            """, group_id, enabled)
+        self._group_settings.pop(group_id, None)
     
     async def store_message_mapping(self, forwarded_message_id: int, user_id: int):
         """Store mapping of forwarded message to user"""
@@ -776,24 +1184,11 @@ class Database:
                 WHERE id = $1
             """, group_id, language.lower())
         # Invalidate cache
-        self._invalidate_cache(f'group_language_{group_id}')
+        self._group_settings.pop(group_id, None)
     
     async def get_group_language(self, group_id: int) -> str:
         """Get language preference for a group (cached to reduce DB queries)"""
-        cache_key = f'group_language_{group_id}'
-        cached = self._get_cache(cache_key)
-        if cached is not None:
-            return cached
-        
-        if not self.pool:
-            raise RuntimeError("Database pool not initialized")
-        async with self.pool.acquire() as conn:
-            result = await conn.fetchval("""
-                SELECT language_preference FROM groups WHERE id = $1
-            """, group_id)
-            language = result if result is not None else 'english'
-            self._set_cache(cache_key, language, self._cache_ttl['group_language'])
-            return language
+        return (await self.get_group_settings(group_id)).language
 
     async def set_user_language(self, user_id: int, language: str):
         """Set language preference for a user (private chat)"""
@@ -974,17 +1369,16 @@ class Database:
             """, clone_bot_id, limit)
             return [dict(r) for r in rows]
 
-    async def add_poll_mapping(self, poll_id: str, quiz_id: int, group_id: int,
-                                message_id: int, clone_bot_id: int, correct_option: int):
-        """Store poll ID → quiz mapping for clone bots"""
+    async def add_poll_mappings(self, rows: List[Tuple]):
+        """Store many poll ID → quiz mappings in one batch of (poll_id, quiz_id, group_id, message_id, clone_bot_id, correct_option) rows"""
         if not self.pool:
             raise RuntimeError("Database pool not initialized")
         async with self.pool.acquire() as conn:
-            await conn.execute("""
+            await conn.executemany("""
                 INSERT INTO poll_mappings (poll_id, quiz_id, group_id, message_id, clone_bot_id, correct_option)
                 VALUES ($1, $2, $3, $4, $5, $6)
                 ON CONFLICT (poll_id) DO NOTHING
-            """, poll_id, quiz_id, group_id, message_id, clone_bot_id, correct_option)
+            """, rows)
 
     async def get_poll_mapping(self, poll_id: str) -> Optional[Dict]:
         """Get poll mapping by poll_id"""
@@ -994,6 +1388,150 @@ class Database:
             row = await conn.fetchrow("SELECT * FROM poll_mappings WHERE poll_id = $1", poll_id)
             return dict(row) if row else None
 
+    async def get_poll_mapping_by_message(self, group_id: int, message_id: int) -> Optional[Dict]:
+        """Get the poll mapping of a quiz message in a chat"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("""
+                SELECT * FROM poll_mappings WHERE group_id = $1 AND message_id = $2 LIMIT 1
+            """, group_id, message_id)
+            return dict(row) if row else None
+
+    async def enqueue_quiz_deliveries(self, quiz_id: int, main_bot_id: int, delay_seconds: float,
+                                      exclude_chat_id: Optional[int] = None) -> int:
+        """
+        Write one outbox row per target chat of a quiz in a single statement.
+
+        Main-bot rows cover every active chat; clone rows cover the chats of every running
+        (not paused) clone. Re-enqueueing the same quiz is a no-op, except that cancelled
+        rows (quiz skipped earlier, e.g. no correct answer yet) become pending again.
+
+        Returns:
+            Number of rows inserted or revived
+        """
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            result = await conn.execute("""
+                INSERT INTO delivery_outbox (quiz_id, chat_id, bot_id, clone_bot_id, chat_type, language, deliver_after)
+                SELECT $1, g.id, $2, NULL, g.type, COALESCE(g.language_preference, 'english'),
+                       NOW() + make_interval(secs => $3)
+                FROM groups g
+                WHERE g.is_active = TRUE AND g.id IS DISTINCT FROM $4
+                UNION ALL
+                SELECT $1, g.id, g.clone_bot_id, g.clone_bot_id, g.type, COALESCE(g.language_preference, 'english'),
+                       NOW() + make_interval(secs => $3)
+                FROM groups g
+                JOIN clone_bots cb ON cb.bot_id = g.clone_bot_id
+                WHERE g.is_active = TRUE AND cb.is_active = TRUE AND cb.is_paused = FALSE
+                ON CONFLICT (quiz_id, chat_id, bot_id) DO UPDATE SET
+                    status = 'pending',
+                    attempts = 0,
+                    deliver_after = EXCLUDED.deliver_after,
+                    claimed_at = NULL,
+                    error = NULL
+                WHERE delivery_outbox.status = 'cancelled'
+            """, quiz_id, main_bot_id, float(delay_seconds), exclude_chat_id)
+            return int(result.split()[-1])
+
+    async def claim_quiz_deliveries(self, quiz_id: int, limit: int) -> List[Dict]:
+        """Atomically move up to `limit` pending rows of a quiz to 'sending' and return them"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                UPDATE delivery_outbox
+                SET status = 'sending', claimed_at = NOW(), attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM delivery_outbox
+                    WHERE quiz_id = $1 AND status = 'pending'
+                    ORDER BY id
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, quiz_id, chat_id, bot_id, clone_bot_id, chat_type, language, attempts
+            """, quiz_id, limit)
+            return [dict(r) for r in rows]
+
+    async def complete_deliveries(self, results: List[Dict]):
+        """Record the outcome of many claimed rows in one statement"""
+        if not results:
+            return
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                UPDATE delivery_outbox o
+                SET status = r.status,
+                    sent_at = CASE WHEN r.status = 'sent' THEN NOW() END,
+                    poll_id = r.poll_id,
+                    message_id = r.message_id,
+                    latency_ms = r.latency_ms,
+                    error = r.error
+                FROM unnest($1::bigint[], $2::text[], $3::text[], $4::bigint[], $5::int[], $6::text[])
+                     AS r(id, status, poll_id, message_id, latency_ms, error)
+                WHERE o.id = r.id
+            """,
+                [r['id'] for r in results],
+                [r['status'] for r in results],
+                [r.get('poll_id') for r in results],
+                [r.get('message_id') for r in results],
+                [r.get('latency_ms') for r in results],
+                [r.get('error') for r in results])
+
+    async def cancel_quiz_deliveries(self, quiz_id: int, reason: str) -> int:
+        """Mark a quiz's unsent outbox rows 'cancelled' (they are no longer resumed); returns rows cancelled"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            result = await conn.execute("""
+                UPDATE delivery_outbox SET status = 'cancelled', error = $2
+                WHERE quiz_id = $1 AND status IN ('pending', 'sending')
+            """, quiz_id, reason)
+            return int(result.split()[-1])
+
+    async def get_unfinished_deliveries(self, max_age_hours: float) -> List[Dict]:
+        """
+        Prepare the outbox after a restart and list quizzes that still have rows to send.
+
+        Rows left in 'sending' were in flight when the process stopped; they go back to
+        'pending' (at-least-once delivery). Unsent rows enqueued more than `max_age_hours`
+        ago are cancelled instead: a quiz that late is no longer worth posting.
+
+        Returns:
+            [{'quiz_id', 'pending', 'delay_seconds'}] where delay_seconds is the time left until delivery
+        """
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    UPDATE delivery_outbox SET status = 'cancelled', error = 'expired before delivery'
+                    WHERE status IN ('pending', 'sending') AND created_at < NOW() - make_interval(secs => $1)
+                """, float(max_age_hours) * 3600)
+                await conn.execute("UPDATE delivery_outbox SET status = 'pending' WHERE status = 'sending'")
+                rows = await conn.fetch("""
+                    SELECT quiz_id, COUNT(*) AS pending,
+                           GREATEST(EXTRACT(EPOCH FROM MIN(deliver_after) - NOW()), 0) AS delay_seconds
+                    FROM delivery_outbox
+                    WHERE status = 'pending'
+                    GROUP BY quiz_id
+                    ORDER BY quiz_id
+                """)
+            return [dict(r) for r in rows]
+
+    async def purge_delivery_outbox(self, days: int) -> int:
+        """Delete finished outbox rows older than `days`; returns rows deleted"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        async with self.pool.acquire() as conn:
+            result = await conn.execute("""
+                DELETE FROM delivery_outbox
+                WHERE status IN ('sent', 'failed', 'cancelled') AND created_at < NOW() - make_interval(days => $1)
+            """, days)
+            return int(result.split()[-1])
+
     async def add_force_join_group(self, chat_id: int, chat_username: Optional[str] = None, 
                                    chat_title: Optional[str] = None, chat_type: Optional[str] = None,
                                    invite_link: Optional[str] = None, added_by: Optional[int] = None) -> bool:
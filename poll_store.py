@@ -0,0 +1,126 @@
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+from models import db
+from write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+# Buffered poll mappings are written in one batch every N rows or T seconds, whichever comes first
+POLL_FLUSH_ROWS = int(os.environ.get("POLL_FLUSH_ROWS", 500))
+POLL_FLUSH_INTERVAL = float(os.environ.get("POLL_FLUSH_INTERVAL", 0.5))
+# Recently sent or looked-up mappings kept in memory; answers to them never touch the database
+POLL_CACHE_SIZE = int(os.environ.get("POLL_CACHE_SIZE", 50000))
+
+
+class PollMapping:
+    """One poll ID → quiz mapping; slots instead of a dict, since live quizzes keep many of these in memory"""
+
+    __slots__ = ('poll_id', 'quiz_id', 'group_id', 'message_id', 'clone_bot_id', 'correct_option')
+
+    def __init__(self, poll_id: str, quiz_id: int, group_id: int, message_id: int,
+                 clone_bot_id: Optional[int], correct_option: int):
+        self.poll_id = poll_id
+        self.quiz_id = quiz_id
+        self.group_id = group_id
+        self.message_id = message_id
+        self.clone_bot_id = clone_bot_id
+        self.correct_option = correct_option
+
+    @classmethod
+    def from_row(cls, row: Dict) -> 'PollMapping':
+        return cls(row['poll_id'], row['quiz_id'], row['group_id'], row['message_id'],
+                   row['clone_bot_id'], row['correct_option'])
+
+    def as_row(self) -> Tuple:
+        """Column values in db.add_poll_mappings order"""
+        return (self.poll_id, self.quiz_id, self.group_id, self.message_id, self.clone_bot_id, self.correct_option)
+
+
+class PollMappingStore(WriteBehindBuffer):
+    """
+    Write-behind buffer for the poll_mappings table.
+
+    Fan-out adds one mapping per sent poll (main bot and clones); rows are flushed with a
+    single executemany instead of one INSERT per poll. Lookups are served from a bounded LRU
+    of recent mappings, so answers to live quizzes cost one dict lookup; older polls and
+    polls sent before a restart are read back from the database. A second LRU indexes the
+    same records by (chat_id, message_id) for /sol.
+    """
+
+    label = "poll mappings"
+
+    def __init__(self, flush_rows: int = POLL_FLUSH_ROWS, flush_interval: float = POLL_FLUSH_INTERVAL,
+                 cache_size: int = POLL_CACHE_SIZE):
+        super().__init__(flush_rows, flush_interval)
+        self._cache: LRUCache = LRUCache(maxsize=cache_size)
+        self._by_message: LRUCache = LRUCache(maxsize=cache_size)  # {(group_id, message_id): PollMapping}
+        self.hits = 0
+        self.misses = 0
+
+    def add(self, poll_id: str, quiz_id: int, group_id: int, message_id: int,
+            clone_bot_id: Optional[int], correct_option: int):
+        """Buffer a poll ID → quiz mapping"""
+        mapping = PollMapping(poll_id, quiz_id, group_id, message_id, clone_bot_id, correct_option)
+        self._pending[poll_id] = mapping
+        self._cache[poll_id] = mapping
+        self._by_message[(group_id, message_id)] = mapping
+        self._schedule()
+
+    async def get(self, poll_id: str) -> Optional[PollMapping]:
+        """Get a poll mapping, from memory when possible (unflushed rows included)"""
+        mapping = self._cache.get(poll_id) or self._pending.get(poll_id) or self._flushing.get(poll_id)
+        if mapping:
+            self.hits += 1
+            return mapping
+        self.misses += 1
+        row = await db.get_poll_mapping(poll_id)
+        if not row:
+            return None
+        mapping = self._cache[poll_id] = PollMapping.from_row(row)
+        return mapping
+
+    async def find_by_message(self, group_id: int, message_id: int) -> Optional[PollMapping]:
+        """Get the mapping of the quiz poll sent as `message_id` in `group_id` (any bot)"""
+        key = (group_id, message_id)
+        mapping = self._by_message.get(key)
+        if mapping:
+            self.hits += 1
+            return mapping
+        self.misses += 1
+        row = await db.get_poll_mapping_by_message(group_id, message_id)
+        if not row:
+            return None
+        mapping = self._by_message[key] = PollMapping.from_row(row)
+        return mapping
+
+    async def _write(self, batch: Dict[str, PollMapping]):
+        await db.add_poll_mappings([mapping.as_row() for mapping in batch.values()])
+
+    def snapshot(self) -> List[Tuple]:
+        """Cached mappings already written to the database as rows, for the warm-restart snapshot"""
+        # Unflushed rows are left out: after a crash they would live only in the LRU
+        return [mapping.as_row() for poll_id, mapping in self._cache.items()
+                if poll_id not in self._pending and poll_id not in self._flushing]
+
+    def restore(self, rows: List[Tuple]):
+        """Refill the cache from snapshot rows (snapshot() only exports rows already in the database)"""
+        for row in rows:
+            mapping = self._cache[row[0]] = PollMapping(*row)
+            self._by_message[(mapping.group_id, mapping.message_id)] = mapping
+
+    def stats(self) -> Dict:
+        """Lookup counters: cached, backlog, hits, misses, failures"""
+        return {
+            'cached': len(self._cache),
+            'backlog': len(self._pending),
+            'hits': self.hits,
+            'misses': self.misses,
+            'failures': self.failures
+        }
+
+
+poll_store = PollMappingStore()
@@ -0,0 +1,79 @@
+import logging
+import os
+from typing import List, Optional
+
+from cachetools import LRUCache
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Quizzes kept in memory; older ones are reloaded from the quizzes table on demand
+QUIZ_REGISTRY_SIZE = int(os.environ.get("QUIZ_REGISTRY_SIZE", 500))
+
+
+class QuizEntry:
+    """What the bot needs to forward and score a quiz (no live telegram objects)"""
+
+    __slots__ = ('quiz_id', 'question', 'options', 'correct_option', 'explanation', 'message_id')
+
+    def __init__(self, quiz_id: int, question: str, options: List[str], correct_option: int,
+                 message_id: Optional[int] = None, explanation: Optional[str] = None):
+        self.quiz_id = quiz_id
+        self.question = question
+        self.options = options
+        self.correct_option = correct_option
+        self.explanation = explanation
+        self.message_id = message_id
+
+
+class QuizRegistry:
+    """
+    Bounded in-memory registry of recent quizzes.
+
+    Entries are indexed by quiz ID and by their admin-group message ID (used when the admin
+    replies to a quiz with the correct option). Both maps are LRUs, so memory stays flat;
+    anything evicted or lost in a restart is transparently reloaded from the database.
+    """
+
+    def __init__(self, size: int = QUIZ_REGISTRY_SIZE):
+        self._quizzes: LRUCache = LRUCache(maxsize=size)
+        self._by_message: LRUCache = LRUCache(maxsize=size)
+        self.reloads = 0
+
+    def add(self, quiz_id: int, question: str, options: List[str], correct_option: int,
+            message_id: Optional[int] = None, explanation: Optional[str] = None) -> QuizEntry:
+        """Register a quiz (replaces any entry with the same ID)"""
+        entry = QuizEntry(quiz_id, question, options, correct_option, message_id, explanation)
+        self._quizzes[quiz_id] = entry
+        if message_id is not None:
+            self._by_message[message_id] = quiz_id
+        return entry
+
+    async def get(self, quiz_id: int) -> Optional[QuizEntry]:
+        """Get a quiz, reloading it from the database if it is not in memory"""
+        entry = self._quizzes.get(quiz_id)
+        if entry is not None:
+            return entry
+        quiz = await db.get_quiz(quiz_id)
+        if not quiz:
+            return None
+        self.reloads += 1
+        return self.add(quiz_id, quiz['quiz_text'], quiz['options'], quiz['correct_option'],
+                        quiz['message_id'], quiz.get('explanation'))
+
+    async def find_by_message(self, message_id: int, from_group_id: int) -> Optional[QuizEntry]:
+        """Get the quiz posted as `message_id` in `from_group_id` (the admin group)"""
+        quiz_id = self._by_message.get(message_id)
+        if quiz_id is None:
+            quiz = await db.get_quiz_by_message_id(message_id, from_group_id)
+            if not quiz:
+                return None
+            quiz_id = quiz['id']
+        return await self.get(quiz_id)
+
+    def __len__(self) -> int:
+        return len(self._quizzes)
+
+
+quiz_registry = QuizRegistry()
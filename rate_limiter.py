@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, Optional
+
+from aiolimiter import AsyncLimiter
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows a bot roughly 30 messages/sec overall; stay a little under it
+BOT_SEND_RATE = float(os.environ.get("BOT_SEND_RATE", 25))
+CLONE_SEND_RATE = float(os.environ.get("CLONE_SEND_RATE", BOT_SEND_RATE))
+# Separate bucket for replies to users, sized to the headroom left under Telegram's limit
+PRIORITY_SEND_RATE = float(os.environ.get("PRIORITY_SEND_RATE", 5))
+
+# Only message sends count against Telegram's per-bot limit; everything else (getUpdates,
+# answerCallbackQuery, getChatMember, edits, ...) never queues behind a fan-out
+_THROTTLED_ENDPOINTS = {
+    'sendMessage', 'sendPoll', 'copyMessage', 'copyMessages', 'forwardMessage', 'forwardMessages',
+    'sendPhoto', 'sendVideo', 'sendDocument', 'sendAnimation', 'sendAudio', 'sendVoice',
+    'sendSticker', 'sendMediaGroup', 'sendVideoNote',
+}
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """RetryAfter delay in seconds (PTB reports it as int or timedelta depending on version)"""
+    delay = error.retry_after
+    if isinstance(delay, timedelta):
+        return delay.total_seconds()
+    return float(delay)
+
+
+class BotRateLimiter(BaseRateLimiter[None]):
+    """
+    Token bucket shared by every request one bot makes.
+
+    Attached to the bot's Application, so quiz fan-out, replies, broadcasts and scheduled
+    jobs all draw from the same budget. Only send endpoints are throttled. Sends that reply to
+    a user's message (/sol, command answers in groups) use a small bucket of their own
+    (PRIORITY_SEND_RATE, the headroom under Telegram's limit), so they never wait behind a
+    fan-out but cannot exceed that limit either.
+    When Telegram still answers with 429, the whole bucket pauses for the requested time and
+    the RetryAfter is re-raised to the caller.
+    """
+
+    def __init__(self, name: str, rate: float = BOT_SEND_RATE):
+        self.name = name
+        self.rate = rate
+        self._limiter = AsyncLimiter(rate, 1)
+        self._priority_limiter = AsyncLimiter(PRIORITY_SEND_RATE, 1)
+        self._paused_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.retry_after_hits = 0
+        self.priority = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[None],
+    ) -> Any:
+        if endpoint not in _THROTTLED_ENDPOINTS:
+            return await callback(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        pause = self._paused_until - started
+        if pause > 0:
+            await asyncio.sleep(pause)
+        if data and data.get('reply_parameters'):
+            # Interactive reply: its own bucket, so it never queues behind bulk sends
+            self.priority += 1
+            limiter = self._priority_limiter
+        else:
+            limiter = self._limiter
+        async with limiter:
+            waited = loop.time() - started
+            self.requests += 1
+            if waited > 0.001:
+                self.throttled += 1
+                self.wait_seconds += waited
+        try:
+            return await callback(*args, **kwargs)
+        except RetryAfter as e:
+            delay = retry_after_seconds(e)
+            self.retry_after_hits += 1
+            self._paused_until = max(self._paused_until, loop.time() + delay)
+            logger.warning(f"⚠️ {self.name}: Telegram asked to retry after {delay:.0f}s on {endpoint}")
+            raise
+
+    def stats(self) -> Dict:
+        """Live counters: rate, requests, throttled, avg_wait (seconds), retry_after_hits, priority"""
+        return {
+            'rate': self.rate,
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'avg_wait': self.wait_seconds / self.throttled if self.throttled else 0.0,
+            'retry_after_hits': self.retry_after_hits,
+            'priority': self.priority
+        }
+
+
+# One limiter per bot token, so /stats can report every bot's counters
+rate_limiters: Dict[str, BotRateLimiter] = {}
+
+
+def get_rate_limiter(bot_token: str, name: str, rate: float = BOT_SEND_RATE) -> BotRateLimiter:
+    """Return the limiter for a bot token, creating it on first use"""
+    if bot_token not in rate_limiters:
+        rate_limiters[bot_token] = BotRateLimiter(name, rate)
+    return rate_limiters[bot_token]
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from write_behind import BackgroundTasks
+
+logger = logging.getLogger(__name__)
+
+# Reactions to one poll in one group are collected for this long, then sent as a single message
+REPLY_DIGEST_WINDOW = float(os.environ.get("REPLY_DIGEST_WINDOW", 15))
+
+# flush(chat_id, correct_users, wrong_users); users are {'id', 'first_name'} dicts in answer order
+DigestFlush = Callable[[int, List[Dict], List[Dict]], Awaitable[None]]
+
+
+class ReplyDigest:
+    """
+    Coalesces quiz answer reactions into one message per (chat, poll) window.
+
+    The first answer opens a window; every answer that arrives before it closes is added to
+    the same digest, which is then handed to the flush callback in one piece.
+    """
+
+    def __init__(self, window: float = REPLY_DIGEST_WINDOW):
+        self.window = window
+        self._windows: Dict[Tuple[int, str], Dict[str, Dict[int, Dict]]] = {}
+        self.answers = 0
+        self.digests = 0
+        self._tasks = BackgroundTasks()
+
+    def add(self, chat_id: int, poll_id: str, user, correct: bool, flush: DigestFlush):
+        """Add one answer to the chat's open window for this poll (opening one if needed)"""
+        key = (chat_id, poll_id)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = {'correct': {}, 'wrong': {}}
+            self._tasks.spawn(self._close_later(key, flush))
+        window['correct' if correct else 'wrong'][user.id] = {'id': user.id, 'first_name': user.first_name}
+        self.answers += 1
+
+    async def _close_later(self, key: Tuple[int, str], flush: DigestFlush):
+        await asyncio.sleep(self.window)
+        window = self._windows.pop(key, None)
+        if not window:
+            return
+        self.digests += 1
+        try:
+            await flush(key[0], list(window['correct'].values()), list(window['wrong'].values()))
+        except Exception as e:
+            logger.error(f"Error sending reply digest to chat {key[0]}: {e}")
+
+
+reply_digest = ReplyDigest()
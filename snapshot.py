@@ -0,0 +1,125 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Hot in-memory state is written here on shutdown and every SNAPSHOT_INTERVAL seconds.
+# Point it at a persistent disk if the host wipes the working directory on deploy.
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "hot_state.snapshot")
+SNAPSHOT_INTERVAL = int(os.environ.get("SNAPSHOT_INTERVAL", 300))
+# Snapshots older than this are ignored (the caches they hold would mostly be cold anyway)
+SNAPSHOT_MAX_AGE = int(os.environ.get("SNAPSHOT_MAX_AGE", 6 * 3600))
+
+SNAPSHOT_MAGIC = b"NQBS"
+SNAPSHOT_VERSION = 1
+FLAG_CLEAN = 0x01  # Written by a graceful shutdown: nothing changed after it
+
+# magic, version, flags, created_at, section count
+_HEADER = struct.Struct("<4sHBdI")
+# Sections: name length + name, payload length + payload
+_NAME_LEN = struct.Struct("<B")
+_SECTION = struct.Struct("<I")
+_COUNT = struct.Struct("<I")
+# poll_id length, then quiz_id, group_id, message_id, clone_bot_id (0 = main bot), correct_option
+_POLL_ID_LEN = struct.Struct("<B")
+_POLL_ROW = struct.Struct("<qqqqb")
+
+Decoder = Callable[[memoryview], Any]
+
+
+def pack_polls(rows: List[Tuple]) -> bytes:
+    """Encode (poll_id, quiz_id, group_id, message_id, clone_bot_id, correct_option) rows"""
+    parts = [_COUNT.pack(len(rows))]
+    for poll_id, quiz_id, group_id, message_id, clone_bot_id, correct_option in rows:
+        encoded = poll_id.encode()
+        parts.append(_POLL_ID_LEN.pack(len(encoded)) + encoded)
+        parts.append(_POLL_ROW.pack(quiz_id, group_id, message_id, clone_bot_id or 0, correct_option))
+    return b"".join(parts)
+
+
+def unpack_polls(buf: memoryview) -> List[Tuple]:
+    (count,) = _COUNT.unpack_from(buf, 0)
+    offset = _COUNT.size
+    rows = []
+    for _ in range(count):
+        (length,) = _POLL_ID_LEN.unpack_from(buf, offset)
+        offset += _POLL_ID_LEN.size
+        poll_id = bytes(buf[offset:offset + length]).decode()
+        offset += length
+        quiz_id, group_id, message_id, clone_bot_id, correct_option = _POLL_ROW.unpack_from(buf, offset)
+        offset += _POLL_ROW.size
+        rows.append((poll_id, quiz_id, group_id, message_id, clone_bot_id or None, correct_option))
+    return rows
+
+
+def pack_json(value: Any) -> bytes:
+    """Encode text-heavy state (translations, titles) as compact JSON"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def unpack_json(buf: memoryview) -> Any:
+    return json.loads(bytes(buf))
+
+
+def write_snapshot(path: str, sections: Dict[str, bytes], clean: bool):
+    """Write sections to `path` atomically (a crash mid-write leaves the previous snapshot intact)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, FLAG_CLEAN if clean else 0, time.time(), len(sections)))
+        for name, payload in sections.items():
+            encoded = name.encode()
+            f.write(_NAME_LEN.pack(len(encoded)) + encoded)
+            f.write(_SECTION.pack(len(payload)))
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str, decoders: Dict[str, Decoder]) -> Optional[Tuple[bool, float, Dict[str, Any]]]:
+    """
+    Memory-map a snapshot and decode its sections.
+
+    Returns:
+        (clean, created_at, {section: decoded value}), or None if the file is missing, from
+        another format version, too old or corrupt; callers then fall back to the database.
+        Sections without a decoder are skipped.
+    """
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, flags, created_at, count = _HEADER.unpack_from(mm, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                logger.warning(f"Ignoring snapshot {path}: format {magic!r} v{version}, expected v{SNAPSHOT_VERSION}")
+                return None
+            age = time.time() - created_at
+            if age > SNAPSHOT_MAX_AGE:
+                logger.info(f"Ignoring snapshot {path}: {age / 3600:.1f}h old")
+                return None
+            offset = _HEADER.size
+            decoded = {}
+            with memoryview(mm) as view:
+                for _ in range(count):
+                    (length,) = _NAME_LEN.unpack_from(view, offset)
+                    offset += _NAME_LEN.size
+                    name = bytes(view[offset:offset + length]).decode()
+                    offset += length
+                    (size,) = _SECTION.unpack_from(view, offset)
+                    offset += _SECTION.size
+                    if offset + size > len(view):
+                        raise ValueError(f"section {name} truncated")
+                    decoder = decoders.get(name)
+                    if decoder:
+                        with view[offset:offset + size] as payload:
+                            decoded[name] = decoder(payload)
+                    offset += size
+            return bool(flags & FLAG_CLEAN), created_at, decoded
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, BufferError, struct.error) as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
@@ -0,0 +1,78 @@
+import logging
+import os
+from typing import Dict, Optional
+
+from cachetools import LRUCache
+from telegram import Bot, Message
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+# File IDs remembered per (bot, stored solution file)
+SOLUTION_FILE_CACHE_SIZE = int(os.environ.get("SOLUTION_FILE_CACHE_SIZE", 5000))
+
+# solution_type -> (Bot send method, media argument)
+_MEDIA_SENDERS = {
+    'image': ('send_photo', 'photo'),
+    'video': ('send_video', 'video'),
+    'pdf': ('send_document', 'document'),
+}
+
+
+def _sent_file_id(sent: Message, media: str) -> str:
+    if media == 'photo':
+        return sent.photo[-1].file_id
+    return getattr(sent, media).file_id
+
+
+class SolutionSender:
+    """
+    Sends /sol replies for the main bot and every clone.
+
+    Media solutions are stored as file_ids of the main bot (set with /setsol in the admin
+    group), and a file_id only works for the bot that received it. The first time another
+    bot sends one, the file is fetched through the main bot and uploaded once; the file_id
+    Telegram returns is remembered for that bot, so every later send is a plain file_id send.
+    """
+
+    def __init__(self, cache_size: int = SOLUTION_FILE_CACHE_SIZE):
+        self.source_bot: Optional[Bot] = None  # Set by the main bot at startup
+        self._file_ids: LRUCache = LRUCache(maxsize=cache_size)  # {(bot_id, stored_file_id): file_id}
+        self.reused = 0
+        self.uploads = 0
+
+    async def send(self, bot: Bot, message: Message, solution: Dict):
+        """Reply to `message` with a solution row from db.get_quiz_solution"""
+        solution_type = solution["solution_type"]
+        content = solution["solution_content"]
+        if solution_type == "text":
+            await message.reply_html(f"📘 <b>Solution:</b>\n\n{content}")
+            return
+        if solution_type == "link":
+            await message.reply_html(f"🔗 <b>Solution Link:</b> {content}")
+            return
+        if solution_type not in _MEDIA_SENDERS:
+            return
+
+        method, media = _MEDIA_SENDERS[solution_type]
+        send = getattr(bot, method)
+        key = (bot.id, content)
+        file_id = self._file_ids.get(key)
+        if file_id:
+            self.reused += 1
+        try:
+            sent = await send(chat_id=message.chat_id, caption="📘 Solution", **{media: file_id or content})
+        except BadRequest:
+            if self.source_bot is None or bot.id == self.source_bot.id:
+                raise
+            # Not this bot's file: upload it once through this bot
+            source_file = await self.source_bot.get_file(content)
+            data = await source_file.download_as_bytearray()
+            extra = {'filename': os.path.basename(source_file.file_path)} if media == 'document' and source_file.file_path else {}
+            sent = await send(chat_id=message.chat_id, caption="📘 Solution", **{media: bytes(data)}, **extra)
+            self.uploads += 1
+            logger.info(f"Uploaded solution {solution_type} for bot {bot.id}")
+        self._file_ids[key] = _sent_file_id(sent, media)
+
+
+solution_sender = SolutionSender()
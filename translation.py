@@ -0,0 +1,310 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import LRUCache, TTLCache
+from deep_translator import GoogleTranslator
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# deep_translator is blocking HTTP, so it runs in a small dedicated thread pool
+TRANSLATION_WORKERS = int(os.environ.get("TRANSLATION_WORKERS", 2))
+TRANSLATION_TIMEOUT = float(os.environ.get("TRANSLATION_TIMEOUT", 20))
+# A quiz whose translation failed or timed out is not retried for this long (fan-out sends English)
+TRANSLATION_FAILURE_TTL = float(os.environ.get("TRANSLATION_FAILURE_TTL", 600))
+# Finished translations kept in memory in front of the quiz_translations table
+TRANSLATION_CACHE_SIZE = int(os.environ.get("TRANSLATION_CACHE_SIZE", 500))
+# Quizzes stored within this window are translated together in one batch
+TRANSLATION_BATCH_DELAY = float(os.environ.get("TRANSLATION_BATCH_DELAY", 0.5))
+# Options up to this length are memoized as phrases ("Both A and B", "None of these", ...)
+PHRASE_MAX_CHARS = int(os.environ.get("PHRASE_MAX_CHARS", 80))
+PHRASE_CACHE_SIZE = int(os.environ.get("PHRASE_CACHE_SIZE", 20000))
+# Google Translate rejects payloads over 5000 characters; keep headroom for markers
+MAX_REQUEST_CHARS = 4500
+
+# Supported quiz languages -> Google Translate target codes
+LANGUAGE_CODES = {
+    'hindi': 'hi',
+}
+
+# Items are packed as "⟦0⟧ question ⟦1⟧ option A ...". The brackets survive translation,
+# and the indices let us check that nothing was merged, dropped or reordered.
+_MARKER_RE = re.compile(r'\s*⟦\s*([0-9०-९]+)\s*⟧\s*')
+_DEVANAGARI_DIGITS = str.maketrans('०१२३४५६७८९', '0123456789')
+
+
+def phrase_hash(text: str) -> str:
+    """Hash of the normalized text (case, width and whitespace insensitive)"""
+    normalized = " ".join(unicodedata.normalize('NFKC', text).casefold().split())
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def _pack(texts: List[str]) -> str:
+    return " ".join(f"⟦{i}⟧ {text}" for i, text in enumerate(texts))
+
+
+def _unpack(translated: str, expected: int) -> Optional[List[str]]:
+    """Split a packed translation back into items, or None if the markers did not survive"""
+    parts = _MARKER_RE.split(translated or '')
+    # split() yields [prefix, idx0, text0, idx1, text1, ...]
+    if len(parts) != 2 * expected + 1 or parts[0].strip():
+        return None
+    items = []
+    for i in range(expected):
+        index, text = parts[2 * i + 1], parts[2 * i + 2].strip()
+        if int(index.translate(_DEVANAGARI_DIGITS)) != i or not text:
+            return None
+        items.append(text)
+    return items
+
+
+def _chunk(texts: List[str]) -> List[List[str]]:
+    """Group consecutive texts so each packed request stays under MAX_REQUEST_CHARS"""
+    chunks, current, size = [], [], 0
+    for text in texts:
+        cost = len(text) + 8
+        if current and size + cost > MAX_REQUEST_CHARS:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _translate_texts_blocking(texts: List[str], target: str) -> Tuple[List[str], int]:
+    """
+    Translate many texts in as few requests as possible (runs inside a worker thread).
+
+    Returns:
+        Tuple of (translated texts, number of translator requests made)
+    """
+    translator = GoogleTranslator(source='auto', target=target)
+    results = []
+    requests = 0
+    for chunk in _chunk(texts):
+        items = None
+        if len(chunk) > 1:
+            requests += 1
+            items = _unpack(translator.translate(_pack(chunk)), len(chunk))
+            if items is None:
+                logger.warning(f"Packed translation of {len(chunk)} items could not be split, translating one by one")
+        if items is None:
+            requests += len(chunk)
+            items = [translator.translate(text) for text in chunk]
+        results.extend(items)
+    return results, requests
+
+
+class QuizTranslator:
+    """
+    Translates quizzes in the background as soon as they are stored, so fan-out only reads finished results.
+
+    Lookups go LRU -> quiz_translations table -> Google Translate, and new translations are
+    written back to the table, so a restart never translates the same quiz twice. The question
+    and all options of a quiz (and of quizzes stored together) go out in a single request, and
+    short options already seen in any earlier quiz are served from the phrase memo instead.
+    """
+
+    def __init__(self, workers: int = TRANSLATION_WORKERS, timeout: float = TRANSLATION_TIMEOUT,
+                 cache_size: int = TRANSLATION_CACHE_SIZE):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate")
+        self._tasks: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._pending: Dict[Tuple[int, str], Tuple[str, List[str]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._results: LRUCache = LRUCache(maxsize=cache_size)
+        self._failed: TTLCache = TTLCache(maxsize=cache_size, ttl=TRANSLATION_FAILURE_TTL)
+        self._phrases: LRUCache = LRUCache(maxsize=PHRASE_CACHE_SIZE)  # {(phrase_hash, language): text}
+        self.phrase_hits = 0
+        self.phrase_misses = 0
+        self.translator_requests = 0
+
+    async def load_phrases(self):
+        """Preload the phrase memo from the database (called once at startup)"""
+        try:
+            rows = await db.get_translation_phrases(PHRASE_CACHE_SIZE)
+        except Exception as e:
+            logger.warning(f"Could not preload translation phrases: {e}")
+            return
+        # Oldest first so the most recent phrases end up most recently used
+        for row in reversed(rows):
+            self._phrases[(row['phrase_hash'], row['language'])] = row['translated_text']
+        logger.info(f"Preloaded {len(rows)} translation phrases")
+
+    def _lookup_phrase(self, text: str, language: str) -> Optional[str]:
+        if len(text) > PHRASE_MAX_CHARS:
+            return None
+        translated = self._phrases.get((phrase_hash(text), language))
+        if translated is None:
+            self.phrase_misses += 1
+        else:
+            self.phrase_hits += 1
+        return translated
+
+    def phrase_stats(self) -> Dict:
+        """Phrase memo counters: hits, misses, hit_rate (%), size, translator_requests"""
+        lookups = self.phrase_hits + self.phrase_misses
+        return {
+            'hits': self.phrase_hits,
+            'misses': self.phrase_misses,
+            'hit_rate': (self.phrase_hits / lookups * 100) if lookups else 0.0,
+            'size': len(self._phrases),
+            'translator_requests': self.translator_requests
+        }
+
+    def start(self, quiz_id: int, question: str, options: List[str], language: str = 'hindi'):
+        """Schedule translation of a quiz (no-op if already done, in progress or recently failed)"""
+        key = (quiz_id, language)
+        if language not in LANGUAGE_CODES or key in self._results or key in self._tasks or key in self._failed:
+            return
+        self._tasks[key] = asyncio.get_running_loop().create_future()
+        self._pending[key] = (question, list(options))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_pending())
+
+    async def _flush_pending(self):
+        # Let quizzes posted together accumulate so they share one translator request
+        await asyncio.sleep(TRANSLATION_BATCH_DELAY)
+        while self._pending:
+            batch, self._pending = self._pending, {}
+            by_language: Dict[str, Dict[int, Tuple[str, List[str]]]] = {}
+            for (quiz_id, language), quiz in batch.items():
+                by_language.setdefault(language, {})[quiz_id] = quiz
+            for language, quizzes in by_language.items():
+                try:
+                    await self.translate_batch(quizzes, language)
+                except Exception as e:
+                    logger.error(f"Batch translation error: {e}")
+                finally:
+                    for quiz_id in quizzes:
+                        if (quiz_id, language) not in self._results:
+                            # Later fan-out batches send English instead of waiting on the translator again
+                            self._failed[(quiz_id, language)] = True
+                        future = self._tasks.pop((quiz_id, language), None)
+                        if future and not future.done():
+                            future.set_result(None)
+
+    async def translate_batch(self, quizzes: Dict[int, Tuple[str, List[str]]],
+                              language: str = 'hindi') -> Dict[int, Dict]:
+        """
+        Translate several quizzes at once.
+
+        Args:
+            quizzes: {quiz_id: (question, options)}
+            language: Target language name (see LANGUAGE_CODES)
+
+        Returns:
+            {quiz_id: {'question', 'options'}} for every quiz that could be translated
+        """
+        translations = {}
+        missing = {}
+        for quiz_id, quiz in quizzes.items():
+            cached = self._results.get((quiz_id, language))
+            if cached:
+                translations[quiz_id] = cached
+            else:
+                missing[quiz_id] = quiz
+        if not missing:
+            return translations
+
+        try:
+            stored = await db.get_quiz_translations(list(missing), language)
+        except Exception as e:
+            logger.warning(f"Could not load stored translations: {e}")
+            stored = {}
+        for quiz_id, translation in stored.items():
+            self._results[(quiz_id, language)] = translation
+            translations[quiz_id] = translation
+            missing.pop(quiz_id, None)
+        if not missing:
+            return translations
+
+        # Only the question and options missing from the phrase memo go to the translator
+        texts = []
+        memoized_options = {}
+        for quiz_id, (question, options) in missing.items():
+            texts.append(question)
+            memoized_options[quiz_id] = [self._lookup_phrase(option, language) for option in options]
+            texts.extend(option for option, memo in zip(options, memoized_options[quiz_id]) if memo is None)
+        loop = asyncio.get_running_loop()
+        try:
+            translated, requests = await asyncio.wait_for(
+                loop.run_in_executor(self._executor, _translate_texts_blocking, texts, LANGUAGE_CODES[language]),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error(f"Translation of quizzes {list(missing)} to {language} timed out after {self.timeout}s")
+            return translations
+        except Exception as e:
+            logger.error(f"Translation error for quizzes {list(missing)}: {e}")
+            return translations
+
+        self.translator_requests += requests
+
+        new_translations = {}
+        new_phrases = {}
+        translated_items = iter(translated)
+        for quiz_id, (question, options) in missing.items():
+            translated_question = next(translated_items)
+            translated_options = []
+            for option, memo in zip(options, memoized_options[quiz_id]):
+                if memo is None:
+                    memo = next(translated_items)
+                    if len(option) <= PHRASE_MAX_CHARS:
+                        key = phrase_hash(option)
+                        self._phrases[(key, language)] = memo
+                        new_phrases[key] = (key, option, memo)
+                translated_options.append(memo)
+            new_translations[quiz_id] = {'question': translated_question, 'options': translated_options}
+            self._results[(quiz_id, language)] = new_translations[quiz_id]
+        translations.update(new_translations)
+        logger.info(f"Translated quizzes {list(new_translations)} to {language} in {requests} request(s)")
+
+        try:
+            await db.save_quiz_translations(language, new_translations)
+            if new_phrases:
+                await db.save_translation_phrases(language, list(new_phrases.values()))
+        except Exception as e:
+            logger.warning(f"Could not store translations: {e}")
+        return translations
+
+    def snapshot(self) -> Dict:
+        """Finished translations and the phrase memo, for the warm-restart snapshot"""
+        return {
+            'results': [[quiz_id, language, t['question'], t['options']] for (quiz_id, language), t in self._results.items()],
+            'phrases': [[key, language, text] for (key, language), text in self._phrases.items()]
+        }
+
+    def restore(self, state: Dict):
+        """Refill translations and the phrase memo from a snapshot"""
+        for quiz_id, language, question, options in state.get('results', []):
+            self._results[(quiz_id, language)] = {'question': question, 'options': options}
+        for key, language, text in state.get('phrases', []):
+            self._phrases[(key, language)] = text
+        logger.info(f"Restored {len(self._results)} translations and {len(self._phrases)} phrases from snapshot")
+
+    def get(self, quiz_id: int, language: str = 'hindi') -> Optional[Dict]:
+        """Finished translation {'question', 'options'} from memory, or None"""
+        return self._results.get((quiz_id, language))
+
+    async def wait(self, quiz_id: int, language: str = 'hindi') -> Optional[Dict]:
+        """Wait for an in-flight translation (bounded by the timeout) and return it"""
+        future = self._tasks.get((quiz_id, language))
+        if future:
+            await asyncio.shield(future)
+        return self.get(quiz_id, language)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+quiz_translator = QuizTranslator()
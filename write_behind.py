@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Hashable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Longest pause between flush retries while the database keeps failing
+WRITE_BEHIND_MAX_BACKOFF = float(os.environ.get("WRITE_BEHIND_MAX_BACKOFF", 30))
+
+
+class BackgroundTasks:
+    """Strong references to fire-and-forget tasks: the event loop only keeps weak ones to running tasks"""
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+
+class WriteBehindBuffer:
+    """
+    Base class for buffers that batch rows in memory and write them to the database later.
+
+    Rows are added to `_pending` (a dict, so later rows replace earlier ones with the same
+    key) and written every `flush_rows` rows or `flush_interval` seconds, whichever comes
+    first. One flush task runs at a time. A failed batch is merged back into `_pending` and
+    the next attempt waits with exponential backoff, capped at WRITE_BEHIND_MAX_BACKOFF, so a
+    database outage costs one retry per backoff step instead of one per added row.
+
+    Subclasses implement `_write(batch)` and may override `_recover(batch, error)`.
+    """
+
+    label = "rows"  # Used in log messages
+
+    def __init__(self, flush_rows: int, flush_interval: float):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self._pending: Dict[Hashable, Any] = {}
+        self._flushing: Dict[Hashable, Any] = {}
+        self._lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._tasks = BackgroundTasks()
+        self._backoff = 0.0
+        self._failed_attempts = 0
+        self.failures = 0
+
+    def _schedule(self):
+        """Make sure a flush is coming; call after adding to `_pending`"""
+        if len(self._pending) >= self.flush_rows:
+            self._full.set()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = self._tasks.spawn(self._flush_loop())
+
+    async def _flush_loop(self):
+        """The single flush task: runs until nothing is pending"""
+        while self._pending:
+            if self._backoff:
+                await asyncio.sleep(self._backoff)
+            elif len(self._pending) < self.flush_rows:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self.flush()
+
+    async def _write(self, batch: Dict[Hashable, Any]):
+        """Write one batch; raise to keep it for a later attempt"""
+        raise NotImplementedError
+
+    async def _recover(self, batch: Dict[Hashable, Any], error: Exception) -> Dict[Hashable, Any]:
+        """Handle a failed batch; returns the rows to retry later (default: all of them)"""
+        return batch
+
+    async def flush(self):
+        """Write everything pending in one batch (also awaited on shutdown)"""
+        async with self._lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            try:
+                try:
+                    await self._write(self._flushing)
+                    retry = {}
+                except Exception as e:
+                    self.failures += 1
+                    self._failed_attempts += 1
+                    logger.error(f"Failed to flush {len(self._flushing)} {self.label}: {e}")
+                    retry = await self._recover(self._flushing, e)
+            finally:
+                self._flushing = {}
+            if not retry:
+                self._failed_attempts = 0
+                self._backoff = 0.0
+                return
+            # Keep them for the next flush; rows added since then win on conflict
+            self._pending = {**retry, **self._pending}
+            self._backoff = min(max(self._backoff * 2, self.flush_interval), WRITE_BEHIND_MAX_BACKOFF)
+        self._schedule()